@@ -19,6 +19,8 @@ class UserForm(forms.ModelForm):
 
 class UserAdmin(admin.ModelAdmin):
     form = UserForm
+    # Used by the user autocomplete on course admin pages
+    search_fields = ['email', 'name']
 
 
 admin.site.register(User, UserAdmin)
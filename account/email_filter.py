@@ -0,0 +1,105 @@
+"""Bloom filter of registered emails, so unknown ones skip the database.
+
+Login and forgot-password look the email up here first. A miss means the
+email was never registered, a hit still goes to the database (about
+``EMAIL_FILTER_ERROR_RATE`` of unknown emails hit by chance). Emails are added
+when a user is created and never removed; the daily ``rebuild`` drops deleted
+users.
+
+The filter is a Redis bitmap. Bit 0 is set once it holds every user, until
+then (and without Redis) every email counts as a possible hit. An in-process
+filter would miss users created by other processes, so there is none.
+"""
+import hashlib
+import math
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from educa.redis_client import get_redis
+
+
+def canonical_email(email):
+    return email.strip().lower()
+
+
+def _shape():
+    """Bits and hash count for ``EMAIL_FILTER_CAPACITY`` at ``EMAIL_FILTER_ERROR_RATE``."""
+    capacity = settings.EMAIL_FILTER_CAPACITY
+    bits = math.ceil(-capacity * math.log(settings.EMAIL_FILTER_ERROR_RATE) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+def _key():
+    # A new shape gets a new key, which stays unready until rebuilt
+    return 'email-filter:{}:{}'.format(*_shape())
+
+
+def _offsets(email):
+    bits, hashes = _shape()
+    digest = hashlib.sha256(canonical_email(email).encode()).digest()
+    first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:16], 'big') | 1
+    # Bit 0 is the ready flag
+    return [1 + (first + n * second) % bits for n in range(hashes)]
+
+
+def might_exist(email):
+    """``False`` only if no user has this email."""
+    client = get_redis()
+    if client is None:
+        return True
+    pipe = client.pipeline(transaction=False)
+    pipe.getbit(_key(), 0)
+    for offset in _offsets(email):
+        pipe.getbit(_key(), offset)
+    try:
+        ready, *found = pipe.execute()
+    except redis.RedisError:
+        return True
+    return not ready or all(found)
+
+
+def add(email):
+    client = get_redis()
+    if client is None:
+        return
+    key, building = _key(), f'{_key()}:building'
+    try:
+        # The copy being rebuilt gets it too, or the swap could drop it
+        keys = [building, key] if client.exists(building) else [key]
+        pipe = client.pipeline(transaction=False)
+        for name in keys:
+            for offset in _offsets(email):
+                pipe.setbit(name, offset, 1)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+def rebuild(batch_size=10000):
+    """Fill a fresh filter from the users table and swap it in.
+
+    Returns the number of users added, ``None`` without Redis.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    key, building = _key(), f'{_key()}:building'
+    client.delete(building)
+    # Exists before the scan starts, so users created from here on are added to it by ``add``
+    client.setbit(building, 0, 0)
+    User = get_user_model()
+    emails = User.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    count = 0
+    pipe = client.pipeline(transaction=False)
+    for email in emails:
+        for offset in _offsets(email):
+            pipe.setbit(building, offset, 1)
+        count += 1
+        if count % batch_size == 0:
+            pipe.execute()
+    pipe.setbit(building, 0, 1)
+    pipe.rename(building, key)
+    pipe.execute()
+    return count
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.email_filter import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Bloom filter of registered emails, needed once before it is used and after bulk imports'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild()
+        if count is None:
+            self.stdout.write('Redis is not available, the filter is not used')
+            return
+        self.stdout.write(f'{count} emails added in {time.perf_counter() - started:.2f}s')
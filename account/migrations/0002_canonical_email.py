@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:01
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_canonical_email(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    seen = set()
+    batch = []
+    # Of accounts differing only in case, the active, most recently used one gets the canonical email
+    users = User.objects.order_by('-is_active', F('last_login').desc(nulls_last=True), 'email').only('email')
+    for user in users.iterator(chunk_size=2000):
+        canonical = user.email.strip().lower()
+        if canonical in seen:
+            continue
+        seen.add(canonical)
+        user.canonical_email = canonical
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['canonical_email'])
+            batch = []
+    User.objects.bulk_update(batch, ['canonical_email'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='canonical_email',
+            field=models.EmailField(editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(populate_canonical_email, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='canonical_email',
+            field=models.EmailField(editable=False, max_length=254, null=True, unique=True),
+        ),
+    ]
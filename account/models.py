@@ -1,5 +1,8 @@
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+
+from . import email_filter
 
 
 class UserManager(BaseUserManager):
@@ -22,9 +25,29 @@ class UserManager(BaseUserManager):
         extra_fields.setdefault('is_active', True)
         return self._create(email, password, name, **extra_fields)
 
+    def get_by_email(self, email):
+        """The user with this email in any letter case, ``None`` if there is none.
+
+        An exact match wins over accounts that only differ in case, which
+        may exist from before emails were compared case-insensitively.
+        """
+        users = list(self.filter(Q(canonical_email=email_filter.canonical_email(email)) | Q(email=email))[:2])
+        for user in users:
+            if user.email == email:
+                return user
+        return users[0] if users else None
+
+    def get_by_natural_key(self, username):
+        user = self.get_by_email(username)
+        if user is None:
+            raise self.model.DoesNotExist
+        return user
+
 
 class User(AbstractBaseUser):
     email = models.EmailField(primary_key=True)
+    # Lowercased email; NULL only for accounts that clashed with another one when it was added
+    canonical_email = models.EmailField(unique=True, null=True, editable=False)
     name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=False)
@@ -39,6 +62,14 @@ class User(AbstractBaseUser):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding:
+            self.canonical_email = email_filter.canonical_email(self.email)
+        super().save(*args, **kwargs)
+        if adding:
+            transaction.on_commit(lambda: email_filter.add(self.email))
+
     def has_module_perms(self, app_label):
         return self.is_staff
 
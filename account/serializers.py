@@ -1,13 +1,26 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import authenticate, get_user_model
 from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.utils.crypto import constant_time_compare
 from rest_framework import serializers
 
+from . import email_filter
 from .tasks import send_activation_mail
 
 User = get_user_model()
 
 
-class RegistrationSerializer(serializers.Serializer):
+class UserLookupMixin:
+    """Fetches the user of the submitted email once, for all validate methods."""
+
+    def get_user(self, email):
+        if getattr(self, '_user_email', None) != email:
+            self._user = User.objects.get_by_email(email)
+            self._user_email = email
+        return self._user
+
+
+class RegistrationSerializer(UserLookupMixin, serializers.Serializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True)
     password_confirm = serializers.CharField(required=True)
@@ -15,7 +28,7 @@ class RegistrationSerializer(serializers.Serializer):
     last_name = serializers.CharField(max_length=50, required=False)
 
     def validate_email(self, email):
-        if User.objects.filter(email=email).exists():
+        if self.get_user(email) is not None:
             raise serializers.ValidationError('This email already registered')
         return email
 
@@ -27,84 +40,82 @@ class RegistrationSerializer(serializers.Serializer):
         return attrs
 
     def create(self, attrs):
-        user = User.objects.create_user(**attrs)
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(**attrs)
+        except IntegrityError:
+            # A concurrent registration of the same email in another letter case won the race
+            raise serializers.ValidationError({'email': ['This email already registered']})
         user.create_activation_code()
         send_activation_mail.delay(user.email, user.activation_code)
         return user
 
 
-class ActivationSerializer(serializers.Serializer):
+class ActivationSerializer(UserLookupMixin, serializers.Serializer):
     email = serializers.EmailField(required=True)
     code = serializers.CharField(max_length=6, min_length=6, required=True)
 
     def validate_email(self, email):
-        if not User.objects.filter(email=email).exists():
+        if self.get_user(email) is None:
             raise serializers.ValidationError('User not found')
         return email
 
-    def validate_code(self, code):
-        if not User.objects.filter(activation_code=code).exists():
-            raise serializers.ValidationError('Wrong code')
-        return code
-
     def validate(self, attrs):
-        email = attrs.get('email')
-        code = attrs.get('code')
-        if not User.objects.filter(email=email, activation_code=code).exists():
+        user = self.get_user(attrs['email'])
+        if not user.activation_code or not constant_time_compare(user.activation_code, attrs['code']):
             raise serializers.ValidationError('Code do not match')
         return attrs
 
     def activate(self):
-        email = self.validated_data.get('email')
-        user = User.objects.get(email=email)
+        user = self.get_user(self.validated_data['email'])
         user.is_active = True
         user.activation_code = ''
-        user.save()
+        user.save(update_fields=['is_active', 'activation_code'])
 
 
-class LoginSerializer(serializers.Serializer):
+class LoginSerializer(UserLookupMixin, serializers.Serializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True)
 
     def validate_email(self, email):
-        if not User.objects.filter(email=email).exists():
+        email = User.objects.normalize_email(email.strip())
+        if not email_filter.might_exist(email):
             raise serializers.ValidationError('User not registered')
         return email
 
     def validate(self, attrs):
-        request = self.context.get('request')
         email = attrs.get('email')
         password = attrs.get('password')
-        if email and password:
-            user = authenticate(username=email,
-                                password=password,
-                                request=request)
-            if not user:
-                raise serializers.ValidationError('Invalid data entered')
-        else:
+        if not email or not password:
             raise serializers.ValidationError('You must fill email and password')
+        # The backends look the user up by email in any letter case, see UserManager.get_by_natural_key
+        user = authenticate(self.context.get('request'), email=email, password=password)
+        if user is None:
+            # Only failed logins pay for telling an unknown email from a wrong password
+            if self.get_user(email) is None:
+                raise serializers.ValidationError({'email': ['User not registered']})
+            raise serializers.ValidationError('Invalid data entered')
         attrs['user'] = user
         return attrs
 
 
-class ForgotPasswordSerializer(serializers.Serializer):
+class ForgotPasswordSerializer(UserLookupMixin, serializers.Serializer):
     email = serializers.EmailField(required=True)
 
     def validate_email(self, email):
-        if not User.objects.filter(email=email).exists():
+        if not email_filter.might_exist(email) or self.get_user(email) is None:
             raise serializers.ValidationError('User do not registered')
         return email
 
     def send_new_pass(self):
-        email = self.validated_data.get('email')
-        user = User.objects.get(email=email)
+        user = self.get_user(self.validated_data['email'])
         password = User.objects.make_random_password()
         user.set_password(password)
-        user.save()
+        user.save(update_fields=['password'])
         send_mail('Password recovery',
                   f'Your new password: {password}',
                   'test@test.com',
-                  [email])
+                  [user.email])
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -1,7 +1,7 @@
 from educa.celery import app
 
 
-@app.task
+@app.task(ignore_result=True)
 def send_activation_mail(email, activation_code):
     from django.core.mail import send_mail
     message = f'Hello! Your activation code: {activation_code}'
@@ -9,3 +9,9 @@ def send_activation_mail(email, activation_code):
               message,
               'test@test.com',
               [email])
+
+
+@app.task(acks_late=True, ignore_result=True)
+def rebuild_email_filter():
+    from .email_filter import rebuild
+    rebuild()
@@ -1,3 +1,133 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from educa import idempotency
+
+User = get_user_model()
+
+
+@mock.patch('educa.idempotency.get_redis', mock.Mock(return_value=None))
+@mock.patch('account.serializers.send_activation_mail')
+class IdempotentRegistrationTests(TestCase):
+    url = '/account/register/'
+
+    def setUp(self):
+        idempotency._local_store.entries.clear()
+        self.client = APIClient()
+        self.data = {'email': 'new@example.com', 'password': 'secret', 'password_confirm': 'secret', 'name': 'New'}
+
+    def register(self, data, key='retry-1'):
+        return self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_is_replayed(self, send_activation_mail):
+        first = self.register(self.data)
+        retry = self.register(self.data)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((retry.status_code, retry.content), (200, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(User.objects.filter(email='new@example.com').count(), 1)
+        send_activation_mail.delay.assert_called_once()
+
+    def test_key_reused_with_another_body_is_rejected(self, send_activation_mail):
+        self.register(self.data)
+        response = self.register({**self.data, 'email': 'other@example.com'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(User.objects.filter(email='other@example.com').exists())
+        send_activation_mail.delay.assert_called_once()
+
+    def test_another_key_runs_again(self, send_activation_mail):
+        self.register(self.data)
+        response = self.register(self.data, key='retry-2')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_multipart_body_of_the_same_size_is_rejected(self, send_activation_mail):
+        first = self.client.post(self.url, self.data, format='multipart', HTTP_IDEMPOTENCY_KEY='form')
+        retry = self.client.post(self.url, self.data, format='multipart', HTTP_IDEMPOTENCY_KEY='form')
+        other = self.client.post(self.url, {**self.data, 'email': 'old@example.com'}, format='multipart',
+                                 HTTP_IDEMPOTENCY_KEY='form')
+
+        self.assertEqual((first.status_code, retry['Idempotent-Replayed']), (200, 'true'))
+        self.assertEqual(other.status_code, 422)
+        self.assertFalse(User.objects.filter(email='old@example.com').exists())
+
+    def test_requests_without_a_key_are_not_stored(self, send_activation_mail):
+        self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(idempotency._local_store.entries, {})
+
+
+@mock.patch.multiple('educa.redis_client', _client=None, _failed_at=float('inf'))
+class LoginTests(TestCase):
+    url = '/account/login/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('Learner@Example.com', 'secret', 'Learner', is_active=True)
+        self.client = APIClient()
+
+    def login(self, email, password='secret'):
+        return self.client.post(self.url, {'email': email, 'password': password}, format='json')
+
+    def test_email_in_any_letter_case(self):
+        for email in ('Learner@Example.com', 'learner@example.com', ' LEARNER@EXAMPLE.COM '):
+            with self.subTest(email=email):
+                response = self.login(email)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.data['token'])
+
+    def test_failed_logins(self):
+        failures = []
+
+        def handler(sender, credentials, **kwargs):
+            failures.append(credentials['email'])
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+
+        response = self.login('learner@example.com', 'wrong')
+        self.assertEqual((response.status_code, response.data), (400, {'non_field_errors': ['Invalid data entered']}))
+        response = self.login('nobody@example.com')
+        self.assertEqual((response.status_code, list(response.data)), (400, ['email']))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('learner@example.com').status_code, 400)
+        self.assertEqual(failures, ['learner@example.com', 'nobody@example.com', 'learner@example.com'])
+
+
+@mock.patch.multiple('educa.redis_client', _client=None, _failed_at=float('inf'))
+@mock.patch('account.serializers.send_activation_mail')
+class RegistrationTests(TestCase):
+    url = '/account/register/'
+
+    def setUp(self):
+        User.objects.create_user('Taken@Example.com', 'secret', 'Taken')
+        self.client = APIClient()
+
+    def register(self, email):
+        return self.client.post(self.url, {'email': email, 'password': 'secret', 'password_confirm': 'secret',
+                                           'name': 'New'}, format='json')
+
+    def test_email_registered_in_another_letter_case(self, send_activation_mail):
+        response = self.register('taken@example.com')
+        self.assertEqual((response.status_code, response.data), (400, {'email': ['This email already registered']}))
+        send_activation_mail.delay.assert_not_called()
+
+    def test_concurrent_case_variant_registration(self, send_activation_mail):
+        # The other registration commits between the check and the insert
+        with mock.patch.object(User.objects, 'get_by_email', return_value=None):
+            response = self.register('TAKEN@example.com')
+        self.assertEqual((response.status_code, response.data), (400, {'email': ['This email already registered']}))
+        self.assertEqual(User.objects.count(), 1)
+        send_activation_mail.delay.assert_not_called()
 
-# Create your tests here.
+    def test_new_email(self, send_activation_mail):
+        self.assertEqual(self.register('new@example.com').status_code, 200)
+        self.assertEqual(User.objects.get(email='new@example.com').canonical_email, 'new@example.com')
+        send_activation_mail.delay.assert_called_once()
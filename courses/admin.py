@@ -1,23 +1,191 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 
-from .models import Course, Module, Subject
+from . import revisions, rollups
+from .models import Comment, Course, CourseDailyStats, Like, Module, Rating, RecomputeRun, Subject
+
+
+def estimated_count(queryset):
+    """Planner row estimate of an unfiltered table, ``None`` if unavailable."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                       [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the planner's estimate instead of ``COUNT(*)`` for big unfiltered tables."""
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the second COUNT(*) over the whole table on filtered changelists
+    show_full_result_count = False
+
+
+class CourseIdFilter(admin.SimpleListFilter):
+    """Filter by ``?course=<pk>`` on the course foreign key index.
+
+    There are too many courses to list as choices, so the filter only shows
+    up once applied, e.g. from the links on the course page.
+    """
+    title = 'course'
+    parameter_name = 'course'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if value and value.isdigit():
+            course = Course.objects.filter(pk=value).values_list('title', flat=True).first()
+            return [(value, course or value)]
+        return []
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(course_id=value)
+        return queryset
+
+
+def course_changelist_link(model, course, label):
+    url = reverse(f'admin:courses_{model._meta.model_name}_changelist')
+    return format_html('<a href="{}?course={}">{}</a>', url, course.pk, label)
 
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ['title', 'slug']
     prepopulated_fields = {'slug': ('title',)}
+    search_fields = ['title']
+
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    def get_queryset(self):
+        if not hasattr(self, '_limited'):
+            self._limited = super().get_queryset()[:settings.ADMIN_INLINE_LIMIT]
+        return self._limited
 
 
-class ModuleInline(admin.StackedInline):
+class ModuleInline(admin.TabularInline):
+    """Read-only module headers; modules are edited on their own pages."""
     model = Module
+    formset = LimitedInlineFormSet
+    fields = ['title', 'revision', 'video']
+    readonly_fields = fields
+    show_change_link = True
+    can_delete = False
+    extra = 0
+
+    def get_queryset(self, request):
+        # Module.__str__ (shown on each row) needs the course title
+        return super().get_queryset(request).select_related('course') \
+            .only('id', 'title', 'revision', 'video', 'course__id', 'course__title').order_by('id')
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(LargeTableAdmin):
     list_display = ['title', 'subject', 'created']
     list_filter = ['created', 'subject']
-    search_fields = ['title', 'overview']
+    list_select_related = ['subject']
+    search_fields = ['title', '=slug']
     prepopulated_fields = {'slug': ('title',)}
+    autocomplete_fields = ['user', 'subject']
+    readonly_fields = ['related_links']
     inlines = [ModuleInline]
 
+    @admin.display(description='Related')
+    def related_links(self, obj):
+        if obj.pk is None:
+            return '-'
+        return format_html('{} | {} | {} | {}',
+                           course_changelist_link(Module, obj, 'All modules'),
+                           course_changelist_link(Comment, obj, f'Comments ({obj.comment_count})'),
+                           course_changelist_link(Rating, obj, 'Ratings'),
+                           course_changelist_link(Like, obj, 'Likes'))
+
+
+@admin.register(Module)
+class ModuleAdmin(LargeTableAdmin):
+    list_display = ['title', 'course', 'revision']
+    list_filter = [CourseIdFilter]
+    list_select_related = ['course']
+    search_fields = ['title']
+    autocomplete_fields = ['course', 'user']
+    readonly_fields = ['revision']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The changelist never shows lesson bodies
+        return queryset.defer('text', 'description')
+
+    def save_model(self, request, obj, form, change):
+        # changeform_view runs in a transaction, so the lock holds until commit
+        previous = None
+        if change:
+            previous = Module.objects.select_for_update().filter(pk=obj.pk) \
+                .values('revision', *revisions.CONTENT_FIELDS).get()
+        super().save_model(request, obj, form, change)
+        if previous is not None:
+            revisions.record(obj, previous, request.user)
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ['id', 'course', 'user', 'created']
+    list_filter = [CourseIdFilter, 'created']
+    list_select_related = ['course', 'user']
+    search_fields = ['=user__email']
+    autocomplete_fields = ['course', 'user']
+
+
+@admin.register(Rating)
+class RatingAdmin(LargeTableAdmin):
+    list_display = ['id', 'course', 'user', 'rate']
+    list_filter = [CourseIdFilter]
+    list_select_related = ['course', 'user']
+    search_fields = ['=user__email']
+    autocomplete_fields = ['course', 'user']
+
+
+@admin.register(Like)
+class LikeAdmin(LargeTableAdmin):
+    list_display = ['id', 'course', 'user']
+    list_filter = [CourseIdFilter]
+    list_select_related = ['course', 'user']
+    search_fields = ['=user__email']
+    autocomplete_fields = ['course', 'user']
+
+
+@admin.register(RecomputeRun)
+class RecomputeRunAdmin(admin.ModelAdmin):
+    list_display = ['started', 'full', 'status', 'seconds', 'scanned', 'updated']
+    list_filter = ['full', 'status']
+    readonly_fields = ['full', 'started', 'finished', 'seconds', 'scanned', 'updated', 'status', 'timings']
+
+
+@admin.register(CourseDailyStats)
+class CourseDailyStatsAdmin(LargeTableAdmin):
+    list_display = ['course', 'day', 'likes_added', 'favourites_added', 'ratings_added', 'comments_added']
+    list_filter = [CourseIdFilter, 'day']
+    list_select_related = ['course']
+    readonly_fields = ['course', 'day'] + rollups.FIELDS
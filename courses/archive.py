@@ -0,0 +1,75 @@
+"""Lifecycle of high-volume engagement rows.
+
+Old comments are moved into ``ArchivedComment`` and archived rows past their
+retention are purged. Work is done in small primary key chunks, each in its
+own short transaction, so no statement holds locks for long.
+
+Course detail only embeds live comments, so the courses of every archived
+chunk get a new version; ``comment_count`` keeps counting archived comments.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cards import card_cache
+from .models import ArchivedComment, Comment
+from .versions import bump_courses
+
+
+def _delete_comments(ids):
+    # A plain DELETE, without the per-row delete signals: the comments aren't
+    # deleted, so the change feed and counters must not see them go
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def archive_comments(older_than_days=None, chunk_size=1000, pause=0):
+    """Move comments older than ``older_than_days`` into the archive table.
+
+    Returns the number of comments moved.
+    """
+    days = older_than_days if older_than_days is not None else settings.COMMENT_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            comments = list(Comment.objects.filter(created__lt=cutoff).order_by('id')
+                            .select_for_update(skip_locked=True)[:chunk_size])
+            if not comments:
+                return moved
+            ArchivedComment.objects.bulk_create(
+                [ArchivedComment(id=comment.id, course_id=comment.course_id, user_id=comment.user_id,
+                                 text=comment.text, created=comment.created) for comment in comments],
+                ignore_conflicts=True,
+            )
+            _delete_comments([comment.id for comment in comments])
+            course_pks = {comment.course_id for comment in comments}
+            bump_courses(course_pks)
+            transaction.on_commit(lambda pks=course_pks: card_cache.invalidate(pks))
+        moved += len(comments)
+        time.sleep(pause)
+
+
+def purge_archived_comments(older_than_days=None, chunk_size=1000, pause=0):
+    """Delete archived comments past ``COMMENT_ARCHIVE_RETENTION_DAYS``.
+
+    Nothing is purged when the retention is ``None``. Returns the number of
+    rows deleted.
+    """
+    days = older_than_days if older_than_days is not None else settings.COMMENT_ARCHIVE_RETENTION_DAYS
+    if days is None:
+        return 0
+    cutoff = timezone.now() - timedelta(days=days)
+    purged = 0
+    while True:
+        ids = list(ArchivedComment.objects.filter(archived__lt=cutoff).order_by('archived')
+                   .values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return purged
+        # No signal receivers or relations, so this is a single DELETE
+        purged += ArchivedComment.objects.filter(id__in=ids).delete()[0]
+        time.sleep(pause)
@@ -0,0 +1,195 @@
+"""Cache of computed course cards, the shared part of ``CoursesListSerializer``.
+
+Cards sit in two tiers: a per-process LRU in front of Redis. A page of
+courses is looked up with one batched read per tier and only the misses are
+computed. Entries carry the course ``version``, so a card is only used while
+it matches the row being serialized; model signals also evict changed courses
+right away. Computing a missing card takes a short Redis lock, so a popular
+course that just changed is rebuilt by one process while the others wait for
+the result instead of all hitting the database at once.
+
+Hit and miss counts are kept per tier and periodically added to a Redis hash,
+``manage.py course_card_stats`` reports the hit rates across all processes.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from educa.redis_client import get_redis
+
+KEY_PREFIX = 'course-card:'
+LOCK_PREFIX = 'course-card-lock:'
+STATS_KEY = 'course-card-stats'
+TIERS = ('local', 'redis')
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class CardCache:
+    def __init__(self):
+        self.local = LRUCache(settings.COURSE_CARD_LRU_SIZE)
+        self.stats = {f'{tier}_{outcome}': 0 for tier in TIERS for outcome in ('hits', 'misses')}
+        self.stats_lock = threading.Lock()
+        self.stats_flushed_at = time.monotonic()
+
+    @staticmethod
+    def _encode(card):
+        # Same encoder as the renderer, so a card reads back exactly as it is rendered
+        return json.dumps(card, cls=JSONEncoder)
+
+    def get_many(self, courses, compute):
+        """Cards of ``courses``, in order, calling ``compute(course)`` for misses.
+
+        The returned dicts are shared with the cache and must be copied before
+        they are modified.
+        """
+        cards = {}
+        remote = []
+        for course in courses:
+            entry = self.local.get(course.pk)
+            if entry is not None and entry[0] == course.version:
+                cards[course.pk] = entry[1]
+            else:
+                remote.append(course)
+        self._count('local', len(cards), len(remote))
+
+        client = get_redis()
+        missing = remote
+        if remote and client is not None:
+            missing = self._read_redis(client, remote, cards)
+        for course in self._fill(client, missing, cards, compute):
+            self.local.set(course.pk, (course.version, cards[course.pk]))
+        self._flush_stats(client)
+        return [cards[course.pk] for course in courses]
+
+    def _read_redis(self, client, courses, cards):
+        try:
+            values = client.mget([f'{KEY_PREFIX}{course.pk}:{course.version}' for course in courses])
+        except redis.RedisError:
+            return courses
+        missing = []
+        for course, value in zip(courses, values):
+            if value is None:
+                missing.append(course)
+            else:
+                cards[course.pk] = json.loads(value)
+                self.local.set(course.pk, (course.version, cards[course.pk]))
+        self._count('redis', len(courses) - len(missing), len(missing))
+        return missing
+
+    def _fill(self, client, courses, cards, compute):
+        """Compute the cards of ``courses`` and store them, one process per card."""
+        if client is None:
+            for course in courses:
+                cards[course.pk] = json.loads(self._encode(compute(course)))
+            return courses
+        pending = list(courses)
+        deadline = time.monotonic() + settings.COURSE_CARD_LOCK_WAIT
+        while pending:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for course in pending:
+                    pipe.set(f'{LOCK_PREFIX}{course.pk}:{course.version}', 1,
+                             nx=True, px=int(settings.COURSE_CARD_LOCK_TIMEOUT * 1000))
+                acquired = pipe.execute()
+            except redis.RedisError:
+                acquired = [True] * len(pending)
+            owned = [course for course, ok in zip(pending, acquired) if ok or time.monotonic() >= deadline]
+            pending = [course for course in pending if course not in owned]
+            if owned:
+                self._compute(client, owned, cards, compute)
+            if pending:
+                # Someone else is building these, wait for them to show up
+                time.sleep(0.01)
+                try:
+                    values = client.mget([f'{KEY_PREFIX}{course.pk}:{course.version}' for course in pending])
+                except redis.RedisError:
+                    values = [None] * len(pending)
+                for course, value in zip(pending, values):
+                    if value is not None:
+                        cards[course.pk] = json.loads(value)
+                pending = [course for course in pending if course.pk not in cards]
+        return courses
+
+    def _compute(self, client, courses, cards, compute):
+        pipe = client.pipeline(transaction=False)
+        for course in courses:
+            encoded = self._encode(compute(course))
+            cards[course.pk] = json.loads(encoded)
+            pipe.set(f'{KEY_PREFIX}{course.pk}:{course.version}', encoded, ex=settings.COURSE_CARD_TTL)
+            pipe.delete(f'{LOCK_PREFIX}{course.pk}:{course.version}')
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            pass
+
+    def invalidate(self, course_pks):
+        for pk in course_pks:
+            self.local.delete(pk)
+        # Redis keys carry the version, so stale ones are never read again
+        # and simply expire
+
+    def _count(self, tier, hits, misses):
+        with self.stats_lock:
+            self.stats[f'{tier}_hits'] += hits
+            self.stats[f'{tier}_misses'] += misses
+
+    def _flush_stats(self, client):
+        if client is None or time.monotonic() - self.stats_flushed_at < settings.COURSE_CARD_STATS_INTERVAL:
+            return
+        with self.stats_lock:
+            stats = {name: count for name, count in self.stats.items() if count}
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.stats_flushed_at = time.monotonic()
+        try:
+            pipe = client.pipeline(transaction=False)
+            for name, count in stats.items():
+                pipe.hincrby(STATS_KEY, name, count)
+            pipe.execute()
+        except redis.RedisError:
+            pass
+
+
+card_cache = CardCache()
+
+
+def hit_rates(stats):
+    """``{tier: (hits, lookups, rate)}`` from a dict of hit/miss counters."""
+    rates = {}
+    for tier in TIERS:
+        hits = int(stats.get(f'{tier}_hits', 0))
+        lookups = hits + int(stats.get(f'{tier}_misses', 0))
+        rates[tier] = (hits, lookups, hits / lookups if lookups else 0.0)
+    return rates
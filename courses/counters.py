@@ -0,0 +1,101 @@
+"""Denormalized comment statistics kept on ``Course``.
+
+Counts are changed with ``F()`` expressions in a single UPDATE, so concurrent
+comments never lose an increment. ``reconcile_comment_stats`` rebuilds them
+from the comments table. Archived comments keep counting towards the total.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .cards import card_cache
+from .models import ArchivedComment, Comment, Course
+from .versions import bump_courses
+
+PREVIEW_LENGTH = Course._meta.get_field('last_comment_preview').max_length
+
+
+def _preview(text):
+    return text[:PREVIEW_LENGTH]
+
+
+def comment_created(comment):
+    newer = Q(last_comment_at__isnull=True) | Q(last_comment_at__lte=comment.created)
+    Course.objects.filter(pk=comment.course_id).update(
+        comment_count=F('comment_count') + 1,
+        last_comment_at=Case(When(newer, then=Value(comment.created)), default=F('last_comment_at')),
+        last_comment_preview=Case(When(newer, then=Value(_preview(comment.text))),
+                                  default=F('last_comment_preview')),
+    )
+
+
+def comment_updated(comment):
+    Course.objects.filter(pk=comment.course_id, last_comment_at=comment.created).update(
+        last_comment_preview=_preview(comment.text),
+    )
+
+
+def comment_deleted(comment):
+    """Call after ``comment`` was deleted, with the instance still in hand."""
+    comments_deleted([comment])
+
+
+def comments_deleted(comments):
+    """``comment_deleted`` for a batch, with one pass per course."""
+    by_course = {}
+    for comment in comments:
+        by_course.setdefault(comment.course_id, []).append(comment)
+    for course_id, deleted in by_course.items():
+        Course.objects.filter(pk=course_id).update(comment_count=Greatest(F('comment_count') - len(deleted), 0))
+        # Only removing the latest comment needs a look at the comments table
+        newest = max(comment.created for comment in deleted)
+        if Course.objects.filter(pk=course_id, last_comment_at__lte=newest).exists():
+            latest = Comment.objects.filter(course_id=course_id).order_by('-created').first()
+            Course.objects.filter(pk=course_id).update(
+                last_comment_at=latest.created if latest else None,
+                last_comment_preview=_preview(latest.text) if latest else '',
+            )
+
+
+def repaired(course_pks):
+    """Bump and uncache courses after a bulk fix, cards and ETags are keyed by the version."""
+    if course_pks:
+        bump_courses(course_pks)
+        transaction.on_commit(lambda: card_cache.invalidate(course_pks))
+
+
+def reconcile_comment_stats(batch_size=500, course_pks=None):
+    """Recompute the stats of every course (or of ``course_pks``) in primary key batches.
+
+    Returns the number of courses whose stored values were wrong.
+    """
+    courses = Course.objects.all() if course_pks is None else Course.objects.filter(pk__in=course_pks)
+    latest = Comment.objects.filter(course=OuterRef('pk')).order_by('-created')
+    latest_archived = ArchivedComment.objects.filter(course=OuterRef('pk')).order_by('-created')
+    archived_count = (ArchivedComment.objects.filter(course=OuterRef('pk')).order_by()
+                      .values('course').annotate(count=Count('id')).values('count'))
+    fixed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            courses.filter(pk__gt=last_pk).order_by('pk')
+            .annotate(actual_count=Count('comments')
+                      + Coalesce(Subquery(archived_count, output_field=IntegerField()), Value(0)),
+                      actual_last_at=Coalesce(Subquery(latest.values('created')[:1]),
+                                              Subquery(latest_archived.values('created')[:1])),
+                      actual_last_text=Coalesce(Subquery(latest.values('text')[:1]),
+                                                Subquery(latest_archived.values('text')[:1])))
+            .only('pk', 'comment_count', 'last_comment_at', 'last_comment_preview')[:batch_size]
+        )
+        if not batch:
+            return fixed
+        stale = []
+        for course in batch:
+            values = (course.actual_count, course.actual_last_at, _preview(course.actual_last_text or ''))
+            if values != (course.comment_count, course.last_comment_at, course.last_comment_preview):
+                course.comment_count, course.last_comment_at, course.last_comment_preview = values
+                stale.append(course)
+        Course.objects.bulk_update(stale, ['comment_count', 'last_comment_at', 'last_comment_preview'])
+        repaired([course.pk for course in stale])
+        fixed += len(stale)
+        last_pk = batch[-1].pk
@@ -0,0 +1,107 @@
+"""Per-course push events (new comments, likes) for Server-Sent Events clients.
+
+Events are published to Redis pub/sub so every ASGI process sees them. Each
+process keeps a single pattern subscription that relays messages into an
+in-process broker, which fans them out to the connected clients. Without
+Redis the broker is fed directly, which is enough for a single process.
+"""
+import asyncio
+import json
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from educa.redis_client import get_redis
+
+CHANNEL_PREFIX = 'course-events:'
+
+
+class LocalBroker:
+    """Fans messages out to the asyncio queues of subscribed clients.
+
+    ``publish`` may be called from any thread (sync views run in a thread
+    pool under ASGI), so queues are fed through their own event loop.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+
+    def subscribe(self, course_pk):
+        queue = asyncio.Queue(maxsize=settings.COURSE_EVENTS_QUEUE_SIZE)
+        self.subscribers.setdefault(course_pk, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, course_pk, queue):
+        subscribers = self.subscribers.get(course_pk, set())
+        subscribers.difference_update({item for item in subscribers if item[1] is queue})
+        if not subscribers:
+            self.subscribers.pop(course_pk, None)
+
+    def publish(self, course_pk, message):
+        for loop, queue in list(self.subscribers.get(course_pk, ())):
+            loop.call_soon_threadsafe(self._put, queue, message)
+
+    @staticmethod
+    def _put(queue, message):
+        # A client that can't keep up loses events rather than memory
+        if not queue.full():
+            queue.put_nowait(message)
+
+
+broker = LocalBroker()
+_relay = None
+
+
+def publish(course_pk, event, data):
+    message = json.dumps({'event': event, 'data': data}, cls=DjangoJSONEncoder)
+    client = get_redis()
+    if client is None:
+        broker.publish(course_pk, message)
+        return
+    try:
+        client.publish(f'{CHANNEL_PREFIX}{course_pk}', message)
+    except redis.RedisError:
+        broker.publish(course_pk, message)
+
+
+async def _relay_from_redis():
+    client = aioredis.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+        async for message in pubsub.listen():
+            if message['type'] == 'pmessage':
+                course_pk = int(message['channel'].decode()[len(CHANNEL_PREFIX):])
+                broker.publish(course_pk, message['data'].decode())
+    finally:
+        await pubsub.close()
+        await client.close()
+
+
+async def _ensure_relay():
+    global _relay
+    if _relay is not None and not _relay.done():
+        return
+    if await sync_to_async(get_redis, thread_sensitive=False)() is not None:
+        _relay = asyncio.ensure_future(_relay_from_redis())
+
+
+async def subscribe(course_pk):
+    """Async iterator over the event messages of a course.
+
+    Yields ``None`` every ``COURSE_EVENTS_KEEPALIVE`` seconds without events so
+    the caller can keep the connection alive.
+    """
+    await _ensure_relay()
+    queue = broker.subscribe(course_pk)
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), settings.COURSE_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        broker.unsubscribe(course_pk, queue)
@@ -0,0 +1,102 @@
+"""Change feed for course engagement.
+
+Every save/delete of a ``Course``, ``Comment``, ``Rating``, ``Like`` or
+``Favourite`` appends a ``Change`` row. Consumers read it incrementally with
+``/changes/?after=<seq>`` instead of re-downloading the API.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Change, Comment, Course, Rating
+
+
+def _payload(instance):
+    if isinstance(instance, Course):
+        return {'title': instance.title, 'slug': instance.slug, 'subject': instance.subject_id}
+    if isinstance(instance, Comment):
+        return {'user': instance.user_id, 'text': instance.text}
+    if isinstance(instance, Rating):
+        return {'user': instance.user_id, 'rate': str(instance.rate)}
+    return {'user': instance.user_id}
+
+
+def record_change(instance, action):
+    course_id = instance.pk if isinstance(instance, Course) else instance.course_id
+    return Change.objects.create(model=instance._meta.model_name,
+                                 object_id=instance.pk,
+                                 course_id=course_id,
+                                 action=action,
+                                 data=_payload(instance))
+
+
+def _settled(after):
+    """Changes above ``after`` that no lower sequence can still show up before.
+
+    The sequence is taken at INSERT, inside the writer's transaction, so a
+    higher one may commit first. Entries younger than
+    ``CHANGE_FEED_SETTLE_DELAY`` are held back, together with everything after
+    the first of them, so a consumer moving ``after`` past a sequence never
+    skips a lower one committed later.
+    """
+    changes = Change.objects.filter(id__gt=after)
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_DELAY)
+    unsettled = changes.filter(created__gte=cutoff).order_by('id').values_list('id', flat=True).first()
+    if unsettled is not None:
+        changes = changes.filter(id__lt=unsettled)
+    return changes
+
+
+def read_changes(after=0, limit=100, wait=0):
+    """Settled changes with a sequence above ``after``, oldest first.
+
+    With ``wait`` the call long-polls: it returns as soon as something new has
+    settled, or with an empty list once ``wait`` seconds have passed.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        changes = list(_settled(after)[:limit])
+        if changes or time.monotonic() >= deadline:
+            return changes
+        time.sleep(min(settings.CHANGE_FEED_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+
+def oldest_sequence():
+    return Change.objects.values_list('id', flat=True).first()
+
+
+def _delete_in_chunks(queryset, chunk_size):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += Change.objects.filter(id__in=ids).delete()[0]
+
+
+def compact_changes(chunk_size=1000):
+    """Keep the feed bounded.
+
+    Entries older than ``CHANGE_FEED_COMPACT_AFTER`` that were superseded by a
+    later change of the same object are dropped, entries past
+    ``CHANGE_FEED_RETENTION`` are expired and finally the feed is trimmed to
+    ``CHANGE_FEED_MAX_ROWS``. Deletes run in small chunks to keep locks short.
+    """
+    now = timezone.now()
+    newer = Change.objects.filter(model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+    deleted = _delete_in_chunks(
+        Change.objects.filter(created__lt=now - timedelta(seconds=settings.CHANGE_FEED_COMPACT_AFTER))
+        .filter(Exists(newer)).order_by('id'),
+        chunk_size,
+    )
+    deleted += _delete_in_chunks(
+        Change.objects.filter(created__lt=now - timedelta(seconds=settings.CHANGE_FEED_RETENTION)).order_by('id'),
+        chunk_size,
+    )
+    boundary = Change.objects.order_by('-id').values_list('id', flat=True)[settings.CHANGE_FEED_MAX_ROWS:][:1]
+    if boundary:
+        deleted += _delete_in_chunks(Change.objects.filter(id__lte=boundary[0]).order_by('id'), chunk_size)
+    return deleted
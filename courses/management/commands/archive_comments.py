@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.archive import archive_comments
+
+
+class Command(BaseCommand):
+    help = 'Move old comments into the archive table in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, help='Age in days, COMMENT_ARCHIVE_AFTER_DAYS by default')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        moved = archive_comments(options['older_than'], options['chunk_size'], options['pause'])
+        self.stdout.write(f'{moved} comments archived')
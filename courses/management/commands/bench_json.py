@@ -0,0 +1,70 @@
+import gzip
+import random
+import timeit
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from courses.management.samples import text
+from educa.middleware import brotli
+from educa.renderers import FastJSONRenderer
+
+
+def course_card(rng, pk):
+    return {
+        'id': pk, 'subject': rng.randint(1, 20), 'title': text(rng, 5), 'overview': text(rng, 60),
+        'avr_rating': Decimal(rng.randint(100, 500)) / 100, 'comment_count': rng.randint(0, 500),
+        'last_comment_at': '2021-09-30T10:36:00+06:00', 'last_comment_preview': text(rng, 20),
+        'likes': rng.randint(0, 5000), 'liked': False, 'favourited': False, 'my_rating': None,
+    }
+
+
+def course_list(rng, size):
+    return {'count': 10000, 'next': 'http://testserver/courses/?page=3', 'previous': None,
+            'results': [course_card(rng, pk) for pk in range(size)]}
+
+
+def course_detail(rng, modules, comments, module_words):
+    detail = course_card(rng, 1)
+    detail['created'] = '2021-09-30T10:36:00+06:00'
+    detail['modules'] = [{'id': pk, 'title': text(rng, 4), 'description': text(rng, 40),
+                          'text': text(rng, module_words), 'image': None, 'file': None, 'video': '',
+                          'course': 1, 'user': 'author@example.com'} for pk in range(modules)]
+    detail['comments'] = [{'id': pk, 'text': text(rng, 30), 'user': f'user{pk}@example.com'}
+                          for pk in range(comments)]
+    return detail
+
+
+class Command(BaseCommand):
+    help = 'Compare encode time and wire size of typical course payloads across renderers and encodings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200, help='Encodes per measurement')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        payloads = {
+            'course list page': course_list(rng, settings.REST_FRAMEWORK['PAGE_SIZE']),
+            'course list x50': course_list(rng, 50),
+            'course detail': course_detail(rng, modules=10, comments=50, module_words=800),
+        }
+        renderers = {'stdlib json': JSONRenderer(), 'orjson': FastJSONRenderer()}
+        for name, payload in payloads.items():
+            self.stdout.write(name)
+            body = None
+            for renderer_name, renderer in renderers.items():
+                seconds = timeit.timeit(lambda: renderer.render(payload), number=options['number'])
+                body = renderer.render(payload)
+                self.stdout.write(f'  {renderer_name:<12} {seconds / options["number"] * 1e6:9.1f}us')
+            self.stdout.write(f'  {"raw":<12} {len(body):9d} bytes')
+            self.report_encoding('gzip', body, options['number'],
+                                 lambda: gzip.compress(body, settings.COMPRESSION_GZIP_LEVEL, mtime=0))
+            if brotli is not None:
+                self.report_encoding('br', body, options['number'],
+                                     lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY))
+
+    def report_encoding(self, name, body, number, compress):
+        seconds = timeit.timeit(compress, number=number)
+        self.stdout.write(f'  {name:<12} {len(compress()):9d} bytes  {seconds / number * 1e6:9.1f}us')
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from educa.schema import build_schema
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema once and store it as static JSON'
+
+    def handle(self, *args, **options):
+        content = build_schema()
+        self.stdout.write(f'{len(content)} bytes written to {settings.OPENAPI_SCHEMA_PATH}')
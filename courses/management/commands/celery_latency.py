@@ -0,0 +1,92 @@
+import statistics
+import threading
+import time
+
+from celery.contrib.testing.worker import TestWorkController
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.management.samples import percentile
+from educa.celery import app
+
+TRANSACTIONAL_TASK = 'account.tasks.send_activation_mail'
+BULK_TASK = 'courses.tasks.flush_progress_buffer'
+
+latencies = {}
+lock = threading.Lock()
+
+
+@app.task(name='educa.latency_probe', ignore_result=True)
+def latency_probe(kind, sent_at, duration):
+    time.sleep(duration)
+    with lock:
+        latencies.setdefault(kind, []).append(time.perf_counter() - sent_at)
+
+
+class Command(BaseCommand):
+    help = ('Run the task routing against an in-memory broker with in-process workers '
+            'and report end-to-end latency of transactional tasks under bulk load')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bulk', type=int, default=200, help='Number of bulk (analytics) tasks')
+        parser.add_argument('--transactional', type=int, default=20, help='Number of transactional (mail) tasks')
+        parser.add_argument('--bulk-duration', type=float, default=0.02, help='Seconds each bulk task runs')
+        parser.add_argument('--single-queue', action='store_true',
+                            help='Send everything to one queue, like the unrouted setup did')
+
+    def handle(self, *args, **options):
+        # Settings are read with the CELERY_ namespace, so override them under that name
+        app.conf.update(CELERY_BROKER_URL='memory://',
+                        CELERY_RESULT_BACKEND='cache+memory://',
+                        CELERY_BROKER_TRANSPORT_OPTIONS={'polling_interval': 0.005})
+        routes = {kind: self.route(name, options['single_queue'])
+                  for kind, name in (('transactional', TRANSACTIONAL_TASK), ('bulk', BULK_TASK))}
+        queues = {route['queue'] for route in routes.values()}
+        latencies.clear()
+
+        # The in-memory transport only processes acks between blocking polls, so
+        # a queue's concurrency is emulated with that many solo-pool consumers.
+        # They run in daemon threads and go away with the command.
+        for queue in sorted(queues):
+            profile = settings.WORKER_PROFILES.get(queue, settings.WORKER_PROFILES['default'])
+            for _ in range(profile['concurrency']):
+                worker = TestWorkController(app, pool='solo', concurrency=1, queues=[queue], loglevel='WARNING',
+                                            prefetch_multiplier=profile['prefetch_multiplier'],
+                                            without_heartbeat=True, without_mingle=True, without_gossip=True)
+                threading.Thread(target=worker.start, daemon=True).start()
+                worker.ensure_started()
+
+        total = options['bulk'] + options['transactional']
+        every = max(options['bulk'] // max(options['transactional'], 1), 1)
+        started = time.perf_counter()
+        sent = {'bulk': 0, 'transactional': 0}
+        for i in range(options['bulk']):
+            self.send('bulk', routes['bulk'], options['bulk_duration'])
+            sent['bulk'] += 1
+            if i % every == 0 and sent['transactional'] < options['transactional']:
+                self.send('transactional', routes['transactional'], 0)
+                sent['transactional'] += 1
+        while sent['transactional'] < options['transactional']:
+            self.send('transactional', routes['transactional'], 0)
+            sent['transactional'] += 1
+        while sum(len(values) for values in latencies.values()) < total:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'{total} tasks in {elapsed:.2f}s over queues: {", ".join(sorted(queues))}')
+        for kind, values in sorted(latencies.items()):
+            self.stdout.write(f'{kind:>14}: p50 {percentile(values, 50) * 1000:8.1f}ms  '
+                              f'p95 {percentile(values, 95) * 1000:8.1f}ms  '
+                              f'max {max(values) * 1000:8.1f}ms  '
+                              f'mean {statistics.mean(values) * 1000:8.1f}ms')
+
+    @staticmethod
+    def route(task_name, single_queue):
+        if single_queue:
+            return {'queue': app.conf.task_default_queue, 'priority': app.conf.task_default_priority}
+        route = app.amqp.router.route({}, task_name)
+        return {'queue': route['queue'].name, 'priority': route.get('priority', app.conf.task_default_priority)}
+
+    @staticmethod
+    def send(kind, route, duration):
+        latency_probe.apply_async((kind, time.perf_counter(), duration), **route)
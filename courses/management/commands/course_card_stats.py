@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.cards import STATS_KEY, TIERS, hit_rates
+from educa.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = 'Report course card cache hit rates per tier, summed over all processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after reporting')
+
+    def handle(self, *args, **options):
+        client = get_redis()
+        if client is None:
+            raise CommandError('Redis is not reachable, hit counters are only kept per process')
+        stats = {name.decode(): count for name, count in client.hgetall(STATS_KEY).items()}
+        rates = hit_rates(stats)
+        for tier in TIERS:
+            hits, lookups, rate = rates[tier]
+            self.stdout.write(f'{tier:>6}: {hits}/{lookups} hits ({rate:.1%})')
+        served = rates['local'][1]
+        if served:
+            computed = rates['redis'][1] - rates['redis'][0]
+            self.stdout.write(f'overall: {1 - computed / served:.1%} of cards served from cache')
+        if options['reset']:
+            client.delete(STATS_KEY)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from courses.archive import purge_archived_comments
+from courses.feed import compact_changes
+from courses.recompute import purge_runs
+from courses.rollups import purge_events
+
+
+class Command(BaseCommand):
+    help = ('Purge archived comments, engagement events and recompute logs past retention and compact the change feed, '
+            'in small chunks')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int,
+                            help='Archive age in days, COMMENT_ARCHIVE_RETENTION_DAYS by default')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        purged = purge_archived_comments(options['older_than'], options['chunk_size'], options['pause'])
+        self.stdout.write(f'{purged} archived comments purged')
+        purged = purge_events(chunk_size=options['chunk_size'], pause=options['pause'])
+        self.stdout.write(f'{purged} engagement events purged')
+        self.stdout.write(f'{purge_runs()} recompute runs purged')
+        self.stdout.write(f'{compact_changes(options["chunk_size"])} change feed entries removed')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from courses.recompute import run
+
+
+class Command(BaseCommand):
+    help = 'Rebuild derived course and subject fields for dirty rows, or all rows with --all'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Walk every row, e.g. after a bulk load')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        record = run(full=options['all'], chunk_size=options['chunk_size'])
+        if record is None:
+            self.stdout.write('Nothing done: another run holds the lock, or --all was not given and nothing is '
+                              'dirty or Redis is down')
+            return
+        self.stdout.write(f'{record.scanned} rows scanned, {record.updated} updated in {record.seconds:.2f}s')
+        for name, timing in record.timings.items():
+            self.stdout.write(f'  {name:<20} {timing["updated"]:>8} updated {timing["seconds"]:8.2f}s')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses.counters import reconcile_comment_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized comment count and latest comment of every course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_comment_stats(options['batch_size'])
+        self.stdout.write(f'{fixed} courses corrected')
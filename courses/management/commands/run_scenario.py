@@ -0,0 +1,167 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.management.samples import WORDS, percentile, text
+from courses.models import Course, Subject
+from .seed_data import popularity_weights
+
+DEFAULT_MIX = 'browse=40,search=15,detail=30,like=6,comment=5,login=4'
+
+
+def parse_mix(value):
+    try:
+        mix = {name: float(weight) for name, weight in (item.split('=') for item in value.split(','))}
+    except ValueError:
+        raise CommandError(f'Invalid --mix {value!r}, expected name=weight pairs')
+    unknown = set(mix) - set(Client.operations)
+    if unknown:
+        raise CommandError(f'Unknown operations in --mix: {", ".join(sorted(unknown))}')
+    return mix
+
+
+class Client:
+    """One simulated user with its own keep-alive connection."""
+    operations = ('browse', 'search', 'detail', 'like', 'comment', 'login')
+
+    def __init__(self, base_url, email, password, scenario, seed):
+        url = urlsplit(base_url)
+        self.host, self.port, self.prefix = url.hostname, url.port, url.path.rstrip('/')
+        self.email, self.password = email, password
+        self.scenario = scenario
+        self.rng = random.Random(seed)
+        self.connection = None
+        self.token = None
+
+    def request(self, method, path, data=None):
+        headers = {'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, self.prefix + path, body, headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # The server may close an idle keep-alive connection, retry once on a new one
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def course(self):
+        return self.rng.choices(self.scenario['courses'], cum_weights=self.scenario['weights'])[0]
+
+    def browse(self):
+        if self.rng.random() < 0.3:
+            return self.request('GET', f'/subjects/{self.rng.choice(self.scenario["subjects"])}/')
+        page = min(int(self.rng.expovariate(0.5)) + 1, self.scenario['pages'])
+        return self.request('GET', f'/courses/?{urlencode({"page": page})}')
+
+    def search(self):
+        return self.request('GET', f'/courses/?{urlencode({"search": self.rng.choice(WORDS)})}')
+
+    def detail(self):
+        return self.request('GET', f'/courses/{self.course()}/')
+
+    def like(self):
+        return self.request('POST', f'/courses/{self.course()}/like/')
+
+    def comment(self):
+        return self.request('POST', '/comments/', {'course': self.course(), 'text': text(self.rng, 12)})
+
+    def login(self):
+        status, body = self.request('POST', '/account/login/', {'email': self.email, 'password': self.password})
+        if status == 200:
+            self.token = json.loads(body)['token']
+        return status, body
+
+
+class Command(BaseCommand):
+    help = ('Replay a weighted mix of API calls against a running server with concurrent simulated users '
+            'and report throughput and latency percentiles. Run seed_data first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=16, help='Simulated users running in parallel')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights, default {DEFAULT_MIX}')
+        parser.add_argument('--password', default='password', help='Password the seeded users were created with')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of course popularity')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        courses = list(Course.objects.order_by('pk').values_list('pk', flat=True))
+        emails = list(get_user_model().objects.filter(email__startswith='seed-user', is_active=True)
+                      .order_by('pk').values_list('pk', flat=True)[:options['concurrency']])
+        if not courses or len(emails) < options['concurrency']:
+            raise CommandError('Not enough data, run `manage.py seed_data` first')
+        scenario = {
+            'courses': courses,
+            'weights': popularity_weights(len(courses), options['skew']),
+            'subjects': list(Subject.objects.values_list('pk', flat=True)),
+            'pages': max(1, len(courses) // settings.REST_FRAMEWORK['PAGE_SIZE']),
+        }
+        clients = [Client(options['base_url'], email, options['password'], scenario, options['seed'] + n)
+                   for n, email in enumerate(emails)]
+        for client in clients:
+            status, body = client.login()
+            if status != 200:
+                raise CommandError(f'Login of {client.email} failed with {status}: {body[:200]!r}')
+
+        results = []
+        lock = threading.Lock()
+        names, weights = zip(*mix.items())
+        deadline = time.monotonic() + options['duration']
+
+        def run(client):
+            local = []
+            while time.monotonic() < deadline:
+                name = client.rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status, _ = getattr(client, name)()
+                except (http.client.HTTPException, OSError):
+                    status = None
+                local.append((name, status, time.perf_counter() - started))
+            with lock:
+                results.extend(local)
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=run, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(results, time.monotonic() - started)
+
+    def report(self, results, elapsed):
+        self.stdout.write(f'{len(results)} requests in {elapsed:.1f}s, {len(results) / elapsed:.1f} req/s')
+        self.stdout.write(f'{"operation":<10} {"count":>7} {"errors":>7} {"p50 ms":>8} {"p90 ms":>8} '
+                          f'{"p99 ms":>8} {"max ms":>8}')
+        by_name = {}
+        for name, status, seconds in results:
+            by_name.setdefault(name, []).append((status, seconds))
+        for name in sorted(by_name) + ['all']:
+            rows = by_name.get(name) or [row[1:] for row in results]
+            if not rows:
+                continue
+            latencies = sorted(seconds * 1000 for _, seconds in rows)
+            errors = sum(1 for status, _ in rows if status is None or status >= 500)
+            self.stdout.write(f'{name:<10} {len(rows):>7} {errors:>7} {percentile(latencies, 50):>8.1f} '
+                              f'{percentile(latencies, 90):>8.1f} {percentile(latencies, 99):>8.1f} '
+                              f'{latencies[-1]:>8.1f}')
@@ -0,0 +1,183 @@
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account import email_filter
+from courses import rollups
+from courses.management.samples import text
+from courses.models import Comment, Course, EngagementEvent, Favourite, Like, Module, Rating, Subject
+from courses.recompute import run as recompute
+
+User = get_user_model()
+
+EMAIL_TEMPLATE = 'seed-user{}@example.com'
+
+
+def popularity_weights(count, skew=1.1):
+    """Cumulative Zipf weights: item ``n`` is picked about ``1 / n**skew`` as often as the first."""
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_timestamps(*fields):
+    """Let ``bulk_create`` store the given ``auto_now_add`` fields as generated."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Generate a large, realistic dataset with bulk inserts: users, subjects, courses, modules, '
+            'comments and likes/ratings/favourites skewed towards popular courses')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--subjects', type=int, default=20)
+        parser.add_argument('--courses', type=int, default=2000)
+        parser.add_argument('--modules', type=int, default=8, help='Modules per course')
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--likes', type=int, default=1000000)
+        parser.add_argument('--ratings', type=int, default=300000)
+        parser.add_argument('--favourites', type=int, default=100000)
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of course popularity')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        users = self.create_users(options['users'], options['password'])
+        subjects = self.create_subjects(options['subjects'])
+        courses = self.create_courses(options['courses'], users, subjects)
+        self.create_modules(options['modules'], courses)
+        weights = popularity_weights(len(courses), options['skew'])
+        last_pks = {model: model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+                    for model in rollups.KINDS}
+        self.create_comments(options['comments'], users, courses, weights)
+        for model, total in ((Like, options['likes']), (Rating, options['ratings']),
+                             (Favourite, options['favourites'])):
+            self.create_engagement(model, total, users, courses, weights)
+        self.create_events(last_pks)
+
+        # bulk_create skips signals and save(), so derived fields and the email filter are rebuilt at the end
+        recompute(full=True)
+        rollups.rebuild()
+        email_filter.rebuild()
+        self.stdout.write(f'Done in {time.perf_counter() - started:.1f}s')
+
+    def insert(self, model, objects, **kwargs):
+        started = time.perf_counter()
+        created = 0
+        for batch in batched(objects, self.batch_size):
+            created += len(model.objects.bulk_create(batch, **kwargs))
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {created} in {time.perf_counter() - started:.1f}s')
+
+    def random_time(self, days=730):
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 24 * 60 * 60))
+
+    def create_users(self, count, password):
+        # Hashing is slow on purpose, every user shares one hash
+        password = make_password(password)
+        first = User.objects.filter(email__startswith='seed-user').count()
+        emails = (EMAIL_TEMPLATE.format(first + n) for n in range(count))
+        self.insert(User, (User(email=email, canonical_email=email, name=text(self.rng, 1).title(),
+                                password=password, is_active=True) for email in emails))
+        return list(User.objects.filter(email__startswith='seed-user').values_list('pk', flat=True))
+
+    def create_subjects(self, count):
+        first = Subject.objects.filter(slug__startswith='seed-subject-').count()
+        self.insert(Subject, (Subject(title=text(self.rng, 2).title(), slug=f'seed-subject-{first + n}')
+                              for n in range(count)))
+        return list(Subject.objects.filter(slug__startswith='seed-subject-').values_list('pk', flat=True))
+
+    def create_courses(self, count, users, subjects):
+        authors = self.rng.sample(users, min(len(users), max(1, count // 5)))
+        first = Course.objects.filter(slug__startswith='seed-course-').count()
+        with keep_timestamps(Course._meta.get_field('created')):
+            self.insert(Course, (Course(user_id=self.rng.choice(authors), subject_id=self.rng.choice(subjects),
+                                        title=text(self.rng, 5).capitalize(), slug=f'seed-course-{first + n}',
+                                        overview=text(self.rng, 60), created=self.random_time())
+                                 for n in range(count)))
+        # In pk order, so the first courses get the most engagement
+        return list(Course.objects.filter(slug__startswith='seed-course-').order_by('pk')
+                    .values_list('pk', 'user_id'))
+
+    def create_modules(self, per_course, courses):
+        self.insert(Module, (Module(course_id=course, user_id=author, title=text(self.rng, 4).capitalize(),
+                                    description=text(self.rng, 30), text=text(self.rng, 800))
+                             for course, author in courses for _ in range(per_course)))
+
+    def create_comments(self, total, users, courses, weights):
+        picked = self.rng.choices(courses, cum_weights=weights, k=total)
+        with keep_timestamps(Comment._meta.get_field('created')):
+            self.insert(Comment, (Comment(course_id=course, user_id=self.rng.choice(users),
+                                          text=text(self.rng, self.rng.randint(3, 60)),
+                                          created=self.random_time())
+                                  for course, _ in picked))
+
+    def engagement_pairs(self, total, users, courses, weights):
+        """Distinct ``(user, course)`` pairs, popular courses and a few heavy users dominating."""
+        average = max(1.0, total / len(users))
+        produced = 0
+        for user in itertools.cycle(users):
+            wanted = min(len(courses), total - produced, max(1, int(self.rng.expovariate(1 / average))))
+            if wanted <= 0:
+                return
+            picked = set()
+            for _ in range(wanted * 3):
+                picked.add(self.rng.choices(courses, cum_weights=weights)[0][0])
+                if len(picked) >= wanted:
+                    break
+            for course in picked:
+                yield user, course
+            produced += len(picked)
+
+    def create_engagement(self, model, total, users, courses, weights):
+        pairs = self.engagement_pairs(total, users, courses, weights)
+        if model is Like:
+            objects = (Like(user_id=user, course_id=course) for user, course in pairs)
+        elif model is Rating:
+            objects = (Rating(user_id=user, course_id=course, rate=self.rng.choice((3, 4, 4, 5, 5, 5)))
+                       for user, course in pairs)
+        else:
+            objects = (Favourite(user_id=user, course_id=course, created=self.random_time()) for user, course in pairs)
+        with keep_timestamps(Favourite._meta.get_field('created')):
+            # Pairs may already exist from an earlier run
+            self.insert(model, objects, ignore_conflicts=True)
+
+    def create_events(self, last_pks):
+        """Engagement events for the rows generated above, dated when they were created (or at random)."""
+        def events():
+            for model, kind in rollups.KINDS.items():
+                fields = [field.attname for field in model._meta.concrete_fields
+                          if field.attname in ('course_id', 'created', 'rate')]
+                for row in model.objects.filter(pk__gt=last_pks[model]).values(*fields).iterator():
+                    yield EngagementEvent(course_id=row['course_id'], kind=kind, delta=1, value=row.get('rate', 0),
+                                          created=row.get('created') or self.random_time())
+
+        with keep_timestamps(EngagementEvent._meta.get_field('created')):
+            self.insert(EngagementEvent, events())
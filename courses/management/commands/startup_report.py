@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What each process type imports before it can serve: web loads the URLconf
+# on its first request, workers import the task modules of every app.
+BOOT_SCRIPTS = {
+    'web': 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns',
+    'worker': 'import django; django.setup(); from educa.celery import app; app.loader.import_default_modules()',
+}
+
+
+def import_times(stderr):
+    """Sum the ``-X importtime`` self times (in microseconds) per top-level package."""
+    totals = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Boot a web or worker process in a subprocess and report import time per package'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', choices=['web', 'worker', 'both'], default='both')
+        parser.add_argument('--top', type=int, default=15, help='Number of packages to list')
+
+    def handle(self, *args, **options):
+        roles = ['web', 'worker'] if options['role'] == 'both' else [options['role']]
+        for role in roles:
+            self.report(role, options['top'])
+
+    def report(self, role, top):
+        env = dict(os.environ, PROCESS_ROLE=role, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPTS[role]],
+                                env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if result.returncode:
+            self.stderr.write(result.stderr.splitlines()[-1])
+            return
+        totals = import_times(result.stderr)
+        imported = sum(totals.values())
+        self.stdout.write(f'{role}: boot {wall * 1000:.0f}ms, imports {imported / 1000:.0f}ms')
+        for name, self_us in totals.most_common(top):
+            self.stdout.write(f'  {name:<24} {self_us / 1000:8.1f}ms  {self_us * 100 / imported:5.1f}%')
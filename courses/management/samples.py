@@ -0,0 +1,13 @@
+"""Shared by the seeding and benchmark commands: filler text and latency percentiles."""
+
+WORDS = ('course module lesson python django model query index cache request response '
+         'learner author rating comment subject video chapter exercise review').split()
+
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_change_feed'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='favourite',
+            name='is_favourite',
+        ),
+        migrations.AddField(
+            model_name='favourite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(fields=['user', '-created'], name='favourite_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:39
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Left
+
+
+def populate_comment_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Comment = apps.get_model('courses', 'Comment')
+    comments = Comment.objects.filter(course=OuterRef('pk'))
+    latest = comments.order_by('-created')
+    counts = comments.order_by().values('course').annotate(total=Count('id')).values('total')
+    Course.objects.update(
+        comment_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0),
+        last_comment_at=Subquery(latest.values('created')[:1]),
+        last_comment_preview=Coalesce(Subquery(latest.annotate(preview=Left('text', 200)).values('preview')[:1]), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_favourite_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='last_comment_preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.RunPython(populate_comment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_comment_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
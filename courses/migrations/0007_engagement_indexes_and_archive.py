@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keep the oldest row per (user, course) so the unique constraints can be added
+    for name in ('Like', 'Favourite'):
+        model = apps.get_model('courses', name)
+        keep = model.objects.values('user', 'course').annotate(keep=Min('id')).values('keep')
+        model.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0006_resource_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('created', models.DateTimeField()),
+                ('archived', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='favourite',
+            unique_together={('user', 'course')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('user', 'course')},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['course', '-created'], name='comment_course_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
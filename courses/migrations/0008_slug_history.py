@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_engagement_indexes_and_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=30)),
+                ('slug', models.SlugField(max_length=200)),
+                ('object_id', models.BigIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('model', 'slug')},
+                'index_together': {('model', 'object_id')},
+            },
+        ),
+    ]
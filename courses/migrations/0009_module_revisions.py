@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0008_slug_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='module',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='ModuleRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('delta', models.BinaryField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='courses.module')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='module_revisions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-number'],
+                'unique_together': {('module', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecomputeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(default=False)),
+                ('started', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('seconds', models.FloatField(default=0)),
+                ('scanned', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(blank=True, choices=[('ok', 'Ok'), ('failed', 'Failed')], max_length=10)),
+                ('timings', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-started'],
+            },
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_avg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='course_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
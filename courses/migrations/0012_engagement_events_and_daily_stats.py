@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_recompute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('likes_added', models.PositiveIntegerField(default=0)),
+                ('likes_removed', models.PositiveIntegerField(default=0)),
+                ('favourites_added', models.PositiveIntegerField(default=0)),
+                ('favourites_removed', models.PositiveIntegerField(default=0)),
+                ('ratings_added', models.PositiveIntegerField(default=0)),
+                ('ratings_removed', models.PositiveIntegerField(default=0)),
+                ('rating_change', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('comments_added', models.PositiveIntegerField(default=0)),
+                ('comments_removed', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'course daily stats',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EngagementEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('favourite', 'Favourite'), ('rating', 'Rating'), ('comment', 'Comment')], max_length=10)),
+                ('delta', models.SmallIntegerField()),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=4)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='engagementevent',
+            index=models.Index(fields=['course_id', 'created'], name='event_course_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='engagementevent',
+            index=models.Index(fields=['created'], name='event_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='coursedailystats',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coursedailystats',
+            unique_together={('course', 'day')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_engagement_events_and_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='like',
+            name='is_liked',
+        ),
+    ]
@@ -0,0 +1,183 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models.deletion import Collector
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from . import slugs
+from .permissions import IsAuthor, IsAuthorOrIsAdmin
+from .serializers import BulkDeleteSerializer, BulkUpdateSerializer
+
+
+class ConditionalRetrieveMixin:
+    """ETag/Last-Modified for ``retrieve`` from the object's version alone.
+
+    The version row is read first; a matching ``If-None-Match`` or
+    ``If-Modified-Since`` gets ``304 Not Modified`` without loading or
+    serializing the object. Responses carry per-user fields, so the ETag
+    includes the user and authenticated responses are private.
+
+    Override ``version_state`` when the version is derived from more than the
+    object's own row; it returns ``None`` for a missing object or a malformed
+    lookup, both answered with 404.
+    """
+
+    def version_state(self, lookup):
+        model = self.get_queryset().model
+        try:
+            return model.objects.filter(**lookup).values('pk', 'version', 'updated').first()
+        except (TypeError, ValueError, ValidationError):
+            # A malformed pk, answered like DRF's get_object_or_404
+            return None
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        model = self.get_queryset().model
+        state = self.version_state({self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        if state is None:
+            raise Http404
+        user = request.user.pk if request.user.is_authenticated else ''
+        tag = f'{model._meta.model_name}-{state["pk"]}-{state["version"]}-{user}'
+        etag = 'W/' + quote_etag(hashlib.md5(tag.encode()).hexdigest())
+        last_modified = int(state['updated'].timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, max_age=settings.CONDITIONAL_CACHE_MAX_AGE, must_revalidate=True,
+                                **({'private': True} if user else {'public': True}))
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+class SlugRetrieveMixin:
+    """``GET <prefix>/slug/<slug>/``: ``retrieve`` addressed by slug.
+
+    The slug is resolved to a pk through the slug cache and the request is
+    then handled exactly like ``retrieve``, with the same permissions,
+    queryset and serializer. Old slugs get a permanent redirect.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'by_slug':
+            self.action = 'retrieve'
+        return request
+
+    @action(['GET'], detail=False, url_path=r'slug/(?P<slug>[-\w]+)')
+    def by_slug(self, request, slug=None):
+        model = self.get_queryset().model
+        pk = slugs.resolve(model, slug)
+        if pk is None:
+            current = slugs.moved_to(model, slug)
+            if current is None:
+                raise Http404
+            url = self.reverse_action('by-slug', kwargs={'slug': current})
+            if request.META.get('QUERY_STRING'):
+                url = f'{url}?{request.META["QUERY_STRING"]}'
+            return HttpResponsePermanentRedirect(url)
+        self.kwargs[self.lookup_url_kwarg or self.lookup_field] = pk
+        return self.retrieve(request)
+
+
+class OwnedObjectMixin:
+    """Object fetches that check ownership in SQL.
+
+    For unsafe requests guarded by ``IsAuthor`` (or ``IsAuthorOrIsAdmin`` for
+    non-staff users) ``get_object`` filters on ``user`` in the same query that
+    loads the object, limited to ``fetch_only[action]`` columns when set. A
+    missing row is told apart from someone else's with an ``exists()`` on the
+    failure path only. A malformed pk is a 404, as with DRF's
+    ``get_object_or_404``.
+    """
+    fetch_only = {}
+
+    def owner_filter(self):
+        if self.request.method in SAFE_METHODS:
+            return {}
+        permissions = self.get_permissions()
+        if any(isinstance(permission, IsAuthor) for permission in permissions):
+            return {'user_id': self.request.user.pk}
+        if any(isinstance(permission, IsAuthorOrIsAdmin) for permission in permissions) \
+                and not self.request.user.is_staff:
+            return {'user_id': self.request.user.pk}
+        return {}
+
+    def get_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        owner = self.owner_filter()
+        fields = self.fetch_only.get(self.action)
+        try:
+            obj = (queryset.only(*fields) if fields else queryset).filter(**lookup, **owner).first()
+            found_elsewhere = obj is None and owner and queryset.filter(**lookup).exists()
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if obj is None:
+            if found_elsewhere:
+                self.permission_denied(self.request)
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class BulkOwnedMixin(OwnedObjectMixin):
+    """``bulk_delete`` and ``bulk_update`` of the user's own objects.
+
+    The whole batch is loaded with one ``pk__in`` + ``user`` query; ids that
+    don't exist or aren't the user's are reported back as ``not_found``.
+    """
+
+    def owned_objects(self, ids):
+        queryset = self.get_queryset().filter(pk__in=ids, user_id=self.request.user.pk)
+        fields = self.fetch_only.get(self.action)
+        return list(queryset.only(*fields) if fields else queryset)
+
+    def perform_bulk_destroy(self, objects):
+        # One collector for the batch: signals still fire per object, the
+        # rows are deleted together and nothing is fetched again
+        collector = Collector(using=router.db_for_write(self.get_queryset().model))
+        collector.collect(objects)
+        collector.delete()
+
+    @action(['POST'], detail=False)
+    def bulk_delete(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            objects = self.owned_objects(ids)
+            # Deleting clears the instances' pks
+            deleted = {obj.pk for obj in objects}
+            if objects:
+                self.perform_bulk_destroy(objects)
+        return Response({'deleted': sorted(deleted),
+                         'not_found': [pk for pk in ids if pk not in deleted]})
+
+    @action(['PATCH'], detail=False)
+    def bulk_update(self, request):
+        serializer = BulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+        with transaction.atomic():
+            objects = {obj.pk: obj for obj in self.owned_objects([item['id'] for item in items])}
+            updates = [self.get_serializer(objects[item['id']], data=item, partial=True)
+                       for item in items if item['id'] in objects]
+            errors = {update.instance.pk: update.errors for update in updates if not update.is_valid()}
+            if errors:
+                return Response({'errors': errors}, status=400)
+            for update in updates:
+                self.perform_update(update)
+        return Response({'updated': [update.data for update in updates],
+                         'not_found': [item['id'] for item in items if item['id'] not in objects]})
@@ -1,5 +1,6 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Subquery
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -8,6 +9,9 @@ User = get_user_model()
 class Subject(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
+    version = models.PositiveIntegerField(default=1)
+    updated = models.DateTimeField(auto_now=True)
+    course_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['title']
@@ -16,6 +20,18 @@ class Subject(models.Model):
         return self.title
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_user_state(self, user):
+        """Annotate ``liked``, ``favourited`` and ``my_rating`` for ``user``."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            liked=Exists(Like.objects.filter(course=OuterRef('pk'), user=user)),
+            favourited=Exists(Favourite.objects.filter(course=OuterRef('pk'), user=user)),
+            my_rating=Subquery(Rating.objects.filter(course=OuterRef('pk'), user=user).values('rate')[:1]),
+        )
+
+
 class Course(models.Model):
     user = models.ForeignKey(User,
                              related_name='courses_created',
@@ -27,22 +43,38 @@ class Course(models.Model):
     slug = models.SlugField(max_length=200, unique=True)
     overview = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    comment_count = models.PositiveIntegerField(default=0)
+    last_comment_at = models.DateTimeField(null=True, blank=True)
+    last_comment_preview = models.CharField(max_length=200, blank=True)
+    version = models.PositiveIntegerField(default=1)
+    updated = models.DateTimeField(auto_now=True)
+    # Rebuilt by courses.recompute, see RECOMPUTE_INTERVAL
+    like_count = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+
+    objects = CourseQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
+        indexes = [models.Index(fields=['-created'], name='course_created_idx')]
+
+    # Written with F() updates, by courses.counters and courses.recompute; never by save()
+    DERIVED_FIELDS = ('version', 'comment_count', 'last_comment_at', 'last_comment_preview',
+                      'like_count', 'rating_count', 'rating_avg')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # A full-row save would write back the stale in-memory version and counters
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.DERIVED_FIELDS]
+        super().save(*args, **kwargs)
+
     def avr_rating(self):
-        summ = 0
-        ratings = Rating.objects.filter(course=self)
-        for rating in ratings:
-            summ += rating.rate
-        if len(ratings) > 0:
-            return round(summ / len(ratings), 2)
-        else:
-            return 'No one rated'
+        return self.rating_avg if self.rating_avg is not None else 'No one rated'
 
 
 class Module(models.Model):
@@ -58,11 +90,38 @@ class Module(models.Model):
     image = models.ImageField(blank=True)
     file = models.FileField(blank=True)
     video = models.URLField(blank=True)
+    revision = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return f'{self.title} ---> {self.course}'
 
 
+class ModuleRevision(models.Model):
+    """An earlier version of a module's content.
+
+    ``delta`` is a zlib-compressed reverse delta: applied to the content of
+    revision ``number + 1`` it gives back the content of revision ``number``.
+    The current content lives on ``Module`` itself.
+    """
+    module = models.ForeignKey(Module,
+                               on_delete=models.CASCADE,
+                               related_name='revisions')
+    number = models.PositiveIntegerField()
+    user = models.ForeignKey(User,
+                             on_delete=models.SET_NULL,
+                             null=True,
+                             related_name='module_revisions')
+    delta = models.BinaryField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-number']
+        unique_together = (('module', 'number'), )
+
+    def __str__(self):
+        return f'{self.module_id} r{self.number}'
+
+
 class Comment(models.Model):
     course = models.ForeignKey(Course,
                                on_delete=models.CASCADE,
@@ -73,6 +132,30 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['course', '-created'], name='comment_course_created_idx'),
+                   models.Index(fields=['created'], name='comment_created_idx')]
+
+    def __str__(self):
+        return f'{self.course} --> {self.user}'
+
+
+class ArchivedComment(models.Model):
+    """Cold storage for old comments, moved out of ``Comment`` by ``archive_comments``.
+
+    Rows keep the primary key they had in ``Comment``.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    course = models.ForeignKey(Course,
+                               on_delete=models.CASCADE,
+                               related_name='archived_comments')
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='archived_comments')
+    text = models.TextField()
+    created = models.DateTimeField()
+    archived = models.DateTimeField(auto_now_add=True, db_index=True)
+
     def __str__(self):
         return f'{self.course} --> {self.user}'
 
@@ -96,7 +179,9 @@ class Like(models.Model):
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
                              related_name='likes')
-    is_liked = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = (('user', 'course'), )
 
 
 class Favourite(models.Model):
@@ -106,4 +191,166 @@ class Favourite(models.Model):
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
                              related_name='favourites')
-    is_favourite = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (('user', 'course'), )
+        indexes = [models.Index(fields=['user', '-created'], name='favourite_user_created_idx')]
+
+
+class Enrollment(models.Model):
+    course = models.ForeignKey(Course,
+                               on_delete=models.CASCADE,
+                               related_name='enrollments')
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='enrollments')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (('user', 'course'), )
+
+    def __str__(self):
+        return f'{self.user} --> {self.course}'
+
+
+class ModuleProgress(models.Model):
+    course = models.ForeignKey(Course,
+                               on_delete=models.CASCADE,
+                               related_name='progress')
+    module = models.ForeignKey(Module,
+                               on_delete=models.CASCADE,
+                               related_name='progress')
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='progress')
+    completed = models.BooleanField(default=False)
+    position = models.PositiveIntegerField(null=True, blank=True)
+    updated = models.DateTimeField()
+
+    class Meta:
+        unique_together = (('user', 'module'), )
+        index_together = (('user', 'course'), )
+
+    def __str__(self):
+        return f'{self.module} --> {self.user}'
+
+
+class Change(models.Model):
+    """Append-only feed of engagement changes, ``id`` is the sequence number."""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    )
+
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    course_id = models.BigIntegerField(db_index=True)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    data = models.JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        index_together = (('model', 'object_id'), )
+
+    def __str__(self):
+        return f'{self.id}: {self.model} {self.object_id} {self.action}'
+
+
+class EngagementEvent(models.Model):
+    """A like, favourite, rating or comment being added or removed, rolled up by ``courses.rollups``."""
+    LIKE = 'like'
+    FAVOURITE = 'favourite'
+    RATING = 'rating'
+    COMMENT = 'comment'
+    KINDS = (
+        (LIKE, 'Like'),
+        (FAVOURITE, 'Favourite'),
+        (RATING, 'Rating'),
+        (COMMENT, 'Comment'),
+    )
+
+    course_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    # 1 added, -1 removed, 0 for a changed rating
+    delta = models.SmallIntegerField()
+    # Change of the course's sum of rates
+    value = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['course_id', 'created'], name='event_course_created_idx'),
+                   models.Index(fields=['created'], name='event_created_idx')]
+
+    def __str__(self):
+        return f'{self.course_id}: {self.kind} {self.delta:+d}'
+
+
+class CourseDailyStats(models.Model):
+    """Engagement of a course on one (local) day, rolled up from ``EngagementEvent``."""
+    course = models.ForeignKey(Course,
+                               on_delete=models.CASCADE,
+                               related_name='daily_stats')
+    day = models.DateField()
+    likes_added = models.PositiveIntegerField(default=0)
+    likes_removed = models.PositiveIntegerField(default=0)
+    favourites_added = models.PositiveIntegerField(default=0)
+    favourites_removed = models.PositiveIntegerField(default=0)
+    ratings_added = models.PositiveIntegerField(default=0)
+    ratings_removed = models.PositiveIntegerField(default=0)
+    rating_change = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    comments_added = models.PositiveIntegerField(default=0)
+    comments_removed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('course', 'day'), )
+        ordering = ['day']
+        verbose_name_plural = 'course daily stats'
+
+    def __str__(self):
+        return f'{self.course_id} {self.day}'
+
+
+class SlugHistory(models.Model):
+    """Slugs a course or subject used to have, so old links can be redirected."""
+    model = models.CharField(max_length=30)
+    slug = models.SlugField(max_length=200)
+    object_id = models.BigIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (('model', 'slug'), )
+        index_together = (('model', 'object_id'), )
+
+    def __str__(self):
+        return f'{self.model} {self.slug} -> {self.object_id}'
+
+
+class RecomputeRun(models.Model):
+    """One run of ``courses.recompute``, with its timing and row counts."""
+    OK = 'ok'
+    FAILED = 'failed'
+    STATUSES = (
+        (OK, 'Ok'),
+        (FAILED, 'Failed'),
+    )
+
+    full = models.BooleanField(default=False)
+    started = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    seconds = models.FloatField(default=0)
+    scanned = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, blank=True)
+    timings = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['-started']
+
+    def __str__(self):
+        return f'{self.started:%Y-%m-%d %H:%M:%S} {"full" if self.full else "dirty"} {self.status}'
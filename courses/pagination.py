@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FavouritesPagination(CursorPagination):
+    ordering = '-created'
+
+
+class CommentsPagination(CursorPagination):
+    ordering = '-created'
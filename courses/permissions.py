@@ -10,12 +10,12 @@ class IsAuthorOrIsAdmin(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
             return True
-        return request.user and (request.user == obj.user or request.user.is_staff)
+        return request.user and (obj.user_id == request.user.pk or request.user.is_staff)
 
 
 class IsAuthor(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return bool(request.user and request.user.is_authenticated and request.user == obj.user)
+        return bool(request.user and request.user.is_authenticated and obj.user_id == request.user.pk)
 
 
 class IsAdminUser(BasePermission):
@@ -23,3 +23,8 @@ class IsAdminUser(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         return request.user.is_staff
+
+
+class IsStaff(BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_staff)
@@ -0,0 +1,280 @@
+"""Write-behind buffering of learner progress heartbeats.
+
+Heartbeats are recorded in Redis (or in process memory when Redis is not
+available) and written to ``ModuleProgress`` in batches by the
+``flush_progress_buffer`` beat task. Reads merge the buffered state over the
+persisted rows, so a heartbeat never touches the database.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from educa.redis_client import get_redis
+
+from .models import Enrollment, Module, ModuleProgress
+
+DIRTY_KEY = 'progress:dirty'
+
+
+def _buffer_key(course_pk, user_pk):
+    # The user pk is an email, so it goes last and may contain anything
+    return f'progress:{course_pk}:{user_pk}'
+
+
+def _parse_buffer_key(key):
+    _, course_pk, user_pk = key.split(':', 2)
+    return int(course_pk), user_pk
+
+
+def _decode_state(fields):
+    """Turn ``{'<module>:<attr>': value}`` hash fields into per-module state."""
+    state = {}
+    for field, value in fields.items():
+        if isinstance(field, bytes):
+            field, value = field.decode(), value.decode()
+        module_pk, attr = field.split(':', 1)
+        module_state = state.setdefault(int(module_pk), {'completed': False, 'position': None})
+        if attr == 'position':
+            module_state['position'] = int(value)
+        elif attr == 'completed':
+            module_state['completed'] = True
+        elif attr == 'updated':
+            module_state['updated'] = parse_datetime(value)
+    return state
+
+
+class RedisProgressBuffer:
+    """One hash per (course, user) plus a set of hashes waiting to be flushed.
+
+    Completion is only ever written as ``1``, so it stays sticky without a
+    read-modify-write while positions simply overwrite each other.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def record(self, course_pk, user_pk, module_pk, position=None, completed=False):
+        key = _buffer_key(course_pk, user_pk)
+        fields = {f'{module_pk}:updated': timezone.now().isoformat()}
+        if position is not None:
+            fields[f'{module_pk}:position'] = position
+        if completed:
+            fields[f'{module_pk}:completed'] = 1
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.sadd(DIRTY_KEY, key)
+        pipe.execute()
+
+    def pending(self, course_pk, user_pk):
+        return _decode_state(self.client.hgetall(_buffer_key(course_pk, user_pk)))
+
+    def size(self):
+        return self.client.scard(DIRTY_KEY)
+
+    def drain(self, limit):
+        keys = self.client.spop(DIRTY_KEY, limit) or []
+        entries = []
+        for key in keys:
+            key = key.decode()
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hgetall(key)
+            pipe.delete(key)
+            fields, _ = pipe.execute()
+            if fields:
+                entries.append((*_parse_buffer_key(key), _decode_state(fields)))
+        return entries
+
+    def restore(self, entries):
+        """Put drained entries back, under any heartbeat recorded since."""
+        pipe = self.client.pipeline()
+        for course_pk, user_pk, modules in entries:
+            key = _buffer_key(course_pk, user_pk)
+            for module_pk, state in modules.items():
+                if state['completed']:
+                    pipe.hset(key, f'{module_pk}:completed', 1)
+                if state['position'] is not None:
+                    pipe.hsetnx(key, f'{module_pk}:position', state['position'])
+                if state.get('updated'):
+                    pipe.hsetnx(key, f'{module_pk}:updated', state['updated'].isoformat())
+            pipe.sadd(DIRTY_KEY, key)
+        pipe.execute()
+
+
+class LocalProgressBuffer:
+    """Per-process fallback used when Redis is unreachable.
+
+    A beat worker cannot see this buffer (and without Redis there is no
+    broker to queue a task on), so the recording process flushes it in a
+    background thread once ``PROGRESS_FLUSH_INTERVAL`` has passed or
+    ``PROGRESS_FLUSH_BATCH_SIZE`` entries are waiting. The request that
+    triggers it doesn't wait for the write.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = {}
+        self.flushed_at = time.monotonic()
+        self.flushing = False
+
+    def record(self, course_pk, user_pk, module_pk, position=None, completed=False):
+        with self.lock:
+            course_state = self.buffer.setdefault((course_pk, user_pk), {})
+            module_state = course_state.setdefault(module_pk, {'completed': False, 'position': None})
+            if position is not None:
+                module_state['position'] = position
+            module_state['completed'] = module_state['completed'] or completed
+            module_state['updated'] = timezone.now()
+            due = not self.flushing and (time.monotonic() - self.flushed_at >= settings.PROGRESS_FLUSH_INTERVAL
+                                         or len(self.buffer) >= settings.PROGRESS_FLUSH_BATCH_SIZE)
+            if due:
+                self.flushing = True
+        if due:
+            threading.Thread(target=self.flush_in_background, daemon=True).start()
+
+    def flush_in_background(self):
+        try:
+            flush_progress(self)
+        finally:
+            with self.lock:
+                self.flushing = False
+            # The thread's own connection, it would stay open otherwise
+            connection.close()
+
+    def pending(self, course_pk, user_pk):
+        with self.lock:
+            return {pk: dict(state) for pk, state in self.buffer.get((course_pk, user_pk), {}).items()}
+
+    def size(self):
+        with self.lock:
+            return len(self.buffer)
+
+    def drain(self, limit):
+        with self.lock:
+            keys = list(self.buffer)[:limit]
+            entries = [(*key, self.buffer.pop(key)) for key in keys]
+            self.flushed_at = time.monotonic()
+        return entries
+
+    def restore(self, entries):
+        with self.lock:
+            for course_pk, user_pk, modules in entries:
+                course_state = self.buffer.setdefault((course_pk, user_pk), {})
+                for module_pk, state in modules.items():
+                    current = course_state.setdefault(module_pk, state)
+                    current['completed'] = current['completed'] or state['completed']
+                    if current['position'] is None:
+                        current['position'] = state['position']
+
+
+_local_buffer = LocalProgressBuffer()
+
+
+def get_buffer():
+    client = get_redis()
+    if client is None:
+        return _local_buffer
+    return RedisProgressBuffer(client)
+
+
+def flush_progress(buffer=None, batch_size=None):
+    """Write buffered heartbeats to the database with bulk upserts.
+
+    Returns the number of module progress rows written. A run only takes as
+    many entries as were waiting when it started, so steady traffic can't
+    keep it going; the rest is left for the next run. Entries that fail to be
+    written are put back into the buffer for the next flush.
+    """
+    buffer = buffer or get_buffer()
+    batch_size = batch_size or settings.PROGRESS_FLUSH_BATCH_SIZE
+    written = 0
+    remaining = buffer.size()
+    while remaining > 0:
+        entries = buffer.drain(min(batch_size, remaining))
+        if not entries:
+            break
+        remaining -= len(entries)
+        try:
+            written += _persist(entries)
+        except Exception:
+            buffer.restore(entries)
+            raise
+    return written
+
+
+def _persist(entries):
+    states = {}
+    for course_pk, user_pk, modules in entries:
+        for module_pk, state in modules.items():
+            states[(user_pk, module_pk)] = (course_pk, state)
+
+    # Heartbeats for modules deleted (or moved) in the meantime are dropped
+    module_courses = dict(Module.objects.filter(pk__in={module_pk for _, module_pk in states})
+                          .values_list('pk', 'course_id'))
+    states = {key: value for key, value in states.items()
+              if module_courses.get(key[1]) == value[0]}
+    if not states:
+        return 0
+
+    existing = {
+        (row.user_id, row.module_id): row
+        for row in ModuleProgress.objects.filter(user_id__in={user_pk for user_pk, _ in states},
+                                                 module_id__in={module_pk for _, module_pk in states})
+    }
+    to_update, to_create = [], []
+    for (user_pk, module_pk), (course_pk, state) in states.items():
+        updated = state.get('updated') or timezone.now()
+        row = existing.get((user_pk, module_pk))
+        if row is None:
+            to_create.append(ModuleProgress(course_id=course_pk, module_id=module_pk, user_id=user_pk,
+                                            completed=state['completed'], position=state['position'],
+                                            updated=updated))
+            continue
+        row.completed = row.completed or state['completed']
+        if state['position'] is not None:
+            row.position = state['position']
+        row.updated = updated
+        to_update.append(row)
+
+    enrollments = {(course_pk, user_pk) for (user_pk, _), (course_pk, _) in states.items()}
+    with transaction.atomic():
+        Enrollment.objects.bulk_create([Enrollment(course_id=course_pk, user_id=user_pk)
+                                        for course_pk, user_pk in enrollments],
+                                       ignore_conflicts=True)
+        ModuleProgress.objects.bulk_create(to_create, ignore_conflicts=True)
+        ModuleProgress.objects.bulk_update(to_update, ['completed', 'position', 'updated'])
+    return len(to_create) + len(to_update)
+
+
+def course_progress(course, user):
+    """Progress of ``user`` in ``course``, merging buffered and stored state.
+
+    Buffered heartbeats for modules deleted since are left out.
+    """
+    current = set(course.modules.values_list('pk', flat=True))
+    modules = {
+        row.module_id: {'completed': row.completed, 'position': row.position}
+        for row in ModuleProgress.objects.filter(user=user, course=course)
+        .only('module_id', 'completed', 'position')
+    }
+    for module_pk, state in get_buffer().pending(course.pk, user.pk).items():
+        if module_pk not in current:
+            continue
+        module_state = modules.setdefault(module_pk, {'completed': False, 'position': None})
+        module_state['completed'] = module_state['completed'] or state['completed']
+        if state['position'] is not None:
+            module_state['position'] = state['position']
+
+    total = len(current)
+    completed = sum(1 for state in modules.values() if state['completed'])
+    return {
+        'course': course.pk,
+        'enrolled': bool(modules) or Enrollment.objects.filter(user=user, course=course).exists(),
+        'completed_modules': completed,
+        'total_modules': total,
+        'percent': round(completed * 100 / total, 2) if total else 0,
+        'modules': [{'module': pk, **state} for pk, state in sorted(modules.items())],
+    }
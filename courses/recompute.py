@@ -0,0 +1,207 @@
+"""Periodic rebuild of derived course and subject data.
+
+Signals mark the courses and subjects whose inputs changed in Redis sets.
+``run`` (scheduled by Celery beat every ``RECOMPUTE_INTERVAL`` seconds) pops
+them in chunks and passes each chunk to the recomputers registered for that
+kind. ``run(full=True)`` walks every row in primary key order instead, for
+bulk loads and anything the signals missed; it also runs once a day. Without
+Redis nothing is marked and only full runs do work.
+
+A Redis lock keeps runs from overlapping. Each run is logged as a
+``RecomputeRun`` with the time spent and rows updated per recomputer; logs are
+purged after ``RECOMPUTE_RUN_RETENTION_DAYS``. Repaired rows get their version
+bumped, so cached cards and ETags pick up the fixed values.
+"""
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from educa.redis_client import get_redis
+
+from . import counters, rollups
+from .models import Course, Like, Rating, RecomputeRun, Subject
+from .versions import bump_subjects
+
+DIRTY_PREFIX = 'recompute:dirty:'
+LOCK_KEY = 'recompute:lock'
+MODELS = {'course': Course, 'subject': Subject}
+
+RECOMPUTERS = {kind: [] for kind in MODELS}
+_local_lock = threading.Lock()
+
+
+def recomputer(kind):
+    """Register ``function(pks)`` to rebuild the data of a chunk of ``kind`` rows.
+
+    It returns the number of rows it changed.
+    """
+    def register(function):
+        RECOMPUTERS[kind].append(function)
+        return function
+    return register
+
+
+def mark_dirty(kind, pks):
+    pks = [pk for pk in pks if pk is not None]
+    client = get_redis()
+    if client is None or not pks:
+        return
+    try:
+        client.sadd(f'{DIRTY_PREFIX}{kind}', *pks)
+    except redis.RedisError:
+        pass
+
+
+def _dirty_chunks(client, kind, chunk_size):
+    while True:
+        pks = client.spop(f'{DIRTY_PREFIX}{kind}', chunk_size)
+        if not pks:
+            return
+        yield [int(pk) for pk in pks]
+
+
+def _all_chunks(kind, chunk_size):
+    last_pk = 0
+    while True:
+        pks = list(MODELS[kind].objects.filter(pk__gt=last_pk).order_by('pk')
+                   .values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+class _Lock:
+    """The Redis lock, or a process lock for full runs without Redis.
+
+    redis-py's lock checks its token and deletes the key in one Lua script, so
+    a run that outlived ``RECOMPUTE_LOCK_TIMEOUT`` can't free the next run's lock.
+    """
+
+    def __init__(self, client):
+        self.lock = None
+        if client is not None:
+            self.lock = client.lock(LOCK_KEY, timeout=settings.RECOMPUTE_LOCK_TIMEOUT, blocking=False)
+
+    def acquire(self):
+        if self.lock is None:
+            return _local_lock.acquire(blocking=False)
+        return self.lock.acquire()
+
+    def release(self):
+        if self.lock is None:
+            _local_lock.release()
+            return
+        try:
+            self.lock.release()
+        except redis.exceptions.LockError:
+            pass  # Expired, and maybe taken by another run since
+
+
+def run(full=False, chunk_size=None):
+    """Recompute dirty (or with ``full`` all) rows, returns the ``RecomputeRun``.
+
+    Returns ``None`` when another run holds the lock, or when ``full`` isn't
+    set and nothing is dirty (or there is no Redis to track dirty rows), so idle
+    minutes leave no log.
+    """
+    chunk_size = chunk_size or settings.RECOMPUTE_CHUNK_SIZE
+    client = get_redis()
+    if not full and (client is None or not client.exists(*(f'{DIRTY_PREFIX}{kind}' for kind in MODELS))):
+        return None
+    lock = _Lock(client)
+    if not lock.acquire():
+        return None
+    record = RecomputeRun.objects.create(full=full)
+    started = time.perf_counter()
+    try:
+        for kind in MODELS:
+            chunks = _all_chunks(kind, chunk_size) if full else _dirty_chunks(client, kind, chunk_size)
+            for pks in chunks:
+                try:
+                    _recompute_chunk(record, kind, pks)
+                except Exception:
+                    if not full:
+                        mark_dirty(kind, pks)
+                    raise
+        record.status = RecomputeRun.OK
+    except Exception:
+        record.status = RecomputeRun.FAILED
+        raise
+    finally:
+        record.seconds = time.perf_counter() - started
+        record.finished = timezone.now()
+        record.save()
+        lock.release()
+    return record
+
+
+def purge_runs(older_than_days=None):
+    """Delete ``RecomputeRun`` logs past ``RECOMPUTE_RUN_RETENTION_DAYS``, returns the number deleted."""
+    days = older_than_days if older_than_days is not None else settings.RECOMPUTE_RUN_RETENTION_DAYS
+    return RecomputeRun.objects.filter(started__lt=timezone.now() - timedelta(days=days)).delete()[0]
+
+
+def _recompute_chunk(record, kind, pks):
+    record.scanned += len(pks)
+    for function in RECOMPUTERS[kind]:
+        started = time.perf_counter()
+        updated = function(pks)
+        timing = record.timings.setdefault(function.__name__, {'seconds': 0, 'updated': 0})
+        timing['seconds'] += time.perf_counter() - started
+        timing['updated'] += updated
+        record.updated += updated
+
+
+@recomputer('course')
+def course_engagement(pks):
+    likes = dict(Like.objects.filter(course_id__in=pks).order_by().values('course_id')
+                 .annotate(count=Count('id')).values_list('course_id', 'count'))
+    ratings = {course_id: (count, average) for course_id, count, average in
+               Rating.objects.filter(course_id__in=pks).order_by().values('course_id')
+               .annotate(count=Count('id'), average=Avg('rate')).values_list('course_id', 'count', 'average')}
+    stale = []
+    for course in Course.objects.filter(pk__in=pks).only('pk', 'like_count', 'rating_count', 'rating_avg'):
+        rating_count, average = ratings.get(course.pk, (0, None))
+        if average is not None:
+            average = Decimal(average).quantize(Decimal('0.01'))
+        values = (likes.get(course.pk, 0), rating_count, average)
+        if values != (course.like_count, course.rating_count, course.rating_avg):
+            course.like_count, course.rating_count, course.rating_avg = values
+            stale.append(course)
+    Course.objects.bulk_update(stale, ['like_count', 'rating_count', 'rating_avg'])
+    counters.repaired([course.pk for course in stale])
+    return len(stale)
+
+
+@recomputer('course')
+def comment_stats(pks):
+    return counters.reconcile_comment_stats(course_pks=pks)
+
+
+@recomputer('course')
+def daily_stats(pks):
+    # Events are only ever added to today; yesterday is redone for runs just after midnight
+    return rollups.roll_up(pks, since=timezone.localdate() - timedelta(days=1))
+
+
+@recomputer('subject')
+def subject_stats(pks):
+    # order_by() keeps Course.Meta.ordering out of the GROUP BY
+    counts = dict(Course.objects.filter(subject_id__in=pks).order_by().values('subject_id')
+                  .annotate(count=Count('id')).values_list('subject_id', 'count'))
+    stale = []
+    for subject in Subject.objects.filter(pk__in=pks).only('pk', 'course_count'):
+        if subject.course_count != counts.get(subject.pk, 0):
+            subject.course_count = counts.get(subject.pk, 0)
+            stale.append(subject)
+    Subject.objects.bulk_update(stale, ['course_count'])
+    if stale:
+        bump_subjects([subject.pk for subject in stale])
+    return len(stale)
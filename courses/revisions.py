@@ -0,0 +1,83 @@
+"""Module content history stored as compressed reverse deltas.
+
+Only the current title, description and text are stored in full, on the
+module. Each update adds a ``ModuleRevision`` holding what is needed to turn
+the new content back into the previous one: unchanged runs of lines are
+copied from the newer version and only changed lines are stored. Older
+revisions are rebuilt by walking the deltas back from the current content.
+"""
+import difflib
+import json
+import zlib
+
+from .models import Module, ModuleRevision
+
+CONTENT_FIELDS = ('title', 'description', 'text')
+
+
+def make_delta(new, old):
+    """Operations that rebuild ``old`` from ``new``.
+
+    ``[start, end]`` copies lines of ``new``, a string is inserted as is.
+    """
+    new_lines = new.splitlines(keepends=True)
+    old_lines = old.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, new_lines, old_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(old_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(new, ops):
+    new_lines = new.splitlines(keepends=True)
+    return ''.join(op if isinstance(op, str) else ''.join(new_lines[op[0]:op[1]]) for op in ops)
+
+
+def encode(new, old):
+    delta = {field: make_delta(new[field], old[field]) for field in CONTENT_FIELDS}
+    return zlib.compress(json.dumps(delta, separators=(',', ':')).encode())
+
+
+def decode(content, delta):
+    ops = json.loads(zlib.decompress(delta))
+    return {field: apply_delta(content[field], ops[field]) for field in CONTENT_FIELDS}
+
+
+def current_content(module):
+    return {field: getattr(module, field) for field in CONTENT_FIELDS}
+
+
+def record(module, previous, user):
+    """Store ``previous`` (the module's content before an update) as a revision.
+
+    ``previous`` must include ``revision`` and should be read with
+    ``select_for_update`` in the same transaction as the update.
+    """
+    content = current_content(module)
+    if all(content[field] == previous[field] for field in CONTENT_FIELDS):
+        return None
+    revision = ModuleRevision.objects.create(module=module, number=previous['revision'],
+                                             user=user if user.is_authenticated else None,
+                                             delta=encode(content, previous))
+    # Not F('revision') + 1: the save may have written back a stale revision
+    module.revision = previous['revision'] + 1
+    Module.objects.filter(pk=module.pk).update(revision=module.revision)
+    return revision
+
+
+def content_at(module, number):
+    """Content of revision ``number``, or ``None`` if there is no such revision."""
+    content = current_content(module)
+    if number == module.revision:
+        return content
+    deltas = ModuleRevision.objects.filter(module=module, number__gte=number).order_by('-number') \
+        .values_list('number', 'delta')
+    for revision, delta in deltas:
+        content = decode(content, bytes(delta))
+        if revision == number:
+            return content
+    return None
@@ -0,0 +1,131 @@
+"""Daily engagement statistics per course.
+
+Signals append an ``EngagementEvent`` whenever a like, favourite, rating or
+comment is added or removed (a changed rating is an event too). The
+``daily_stats`` recomputer of ``courses.recompute`` rebuilds the
+``CourseDailyStats`` rows of today and yesterday for courses marked dirty, so
+a run just after midnight still completes the previous day. Rows are rebuilt
+from the events rather than incremented, so running twice changes nothing.
+
+Events are purged after ``ENGAGEMENT_EVENT_RETENTION_DAYS``, the daily rows
+are kept. ``/courses/<pk>/stats/`` only reads the daily rows.
+"""
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Comment, Course, CourseDailyStats, EngagementEvent, Favourite, Like, Rating
+
+KINDS = {Like: EngagementEvent.LIKE, Favourite: EngagementEvent.FAVOURITE,
+         Rating: EngagementEvent.RATING, Comment: EngagementEvent.COMMENT}
+COUNTERS = {
+    'likes': EngagementEvent.LIKE,
+    'favourites': EngagementEvent.FAVOURITE,
+    'ratings': EngagementEvent.RATING,
+    'comments': EngagementEvent.COMMENT,
+}
+FIELDS = [f'{name}_{change}' for name in COUNTERS for change in ('added', 'removed')] + ['rating_change']
+
+
+def _rate(instance):
+    return Decimal(str(instance.rate))
+
+
+def record_saved(instance, created, previous_rate=None):
+    if created:
+        value = _rate(instance) if isinstance(instance, Rating) else 0
+        return EngagementEvent.objects.create(course_id=instance.course_id, kind=KINDS[type(instance)],
+                                              delta=1, value=value)
+    if isinstance(instance, Rating) and previous_rate is not None and previous_rate != _rate(instance):
+        return EngagementEvent.objects.create(course_id=instance.course_id, kind=EngagementEvent.RATING,
+                                              delta=0, value=_rate(instance) - previous_rate)
+    return None
+
+
+def record_deleted(instance):
+    value = -_rate(instance) if isinstance(instance, Rating) else 0
+    return EngagementEvent.objects.create(course_id=instance.course_id, kind=KINDS[type(instance)],
+                                          delta=-1, value=value)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def roll_up(course_pks, since=None):
+    """Rebuild the daily rows of ``course_pks`` from ``since`` (a date) on, or for every retained day.
+
+    Returns the number of rows created or changed.
+    """
+    events = EngagementEvent.objects.filter(course_id__in=Course.objects.filter(pk__in=course_pks).values('pk'))
+    if since is not None:
+        events = events.filter(created__gte=start_of_day(since))
+    aggregates = {}
+    for name, kind in COUNTERS.items():
+        aggregates[f'{name}_added'] = Count('id', filter=Q(kind=kind, delta=1))
+        aggregates[f'{name}_removed'] = Count('id', filter=Q(kind=kind, delta=-1))
+    aggregates['rating_change'] = Sum('value', filter=Q(kind=EngagementEvent.RATING))
+    rows = (events.annotate(day=TruncDate('created'))
+            .order_by().values('course_id', 'day').annotate(**aggregates))
+
+    existing = CourseDailyStats.objects.filter(course_id__in=course_pks)
+    if since is not None:
+        existing = existing.filter(day__gte=since)
+    existing = {(stats.course_id, stats.day): stats for stats in existing}
+    created, changed = [], []
+    for row in rows:
+        row['rating_change'] = row['rating_change'] or Decimal(0)
+        stats = existing.get((row['course_id'], row['day']))
+        if stats is None:
+            created.append(CourseDailyStats(**row))
+        elif any(getattr(stats, field) != row[field] for field in FIELDS):
+            for field in FIELDS:
+                setattr(stats, field, row[field])
+            changed.append(stats)
+    CourseDailyStats.objects.bulk_create(created, ignore_conflicts=True)
+    CourseDailyStats.objects.bulk_update(changed, FIELDS)
+    return len(created) + len(changed)
+
+
+def rebuild(chunk_size=500):
+    """Roll up every retained day of every course, e.g. after loading events in bulk."""
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(Course.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return updated
+        updated += roll_up(pks)
+        last_pk = pks[-1]
+
+
+def daily_series(course_pk, days):
+    """The last ``days`` days of rollups up to today, days without activity included as zeros."""
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    stored = {stats.day: stats for stats in
+              CourseDailyStats.objects.filter(course_id=course_pk, day__gte=start, day__lte=end)}
+    series = []
+    for n in range(days):
+        day = start + timedelta(days=n)
+        series.append(stored.get(day) or CourseDailyStats(course_id=course_pk, day=day))
+    return series
+
+
+def purge_events(older_than_days=None, chunk_size=1000, pause=0):
+    """Delete events past ``ENGAGEMENT_EVENT_RETENTION_DAYS``, returns the number deleted."""
+    days = older_than_days if older_than_days is not None else settings.ENGAGEMENT_EVENT_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    purged = 0
+    while True:
+        ids = list(EngagementEvent.objects.filter(created__lt=cutoff).order_by('created')
+                   .values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return purged
+        purged += EngagementEvent.objects.filter(id__in=ids).delete()[0]
+        time.sleep(pause)
@@ -1,29 +1,70 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from .models import Course, Module, Subject, Comment, Rating, Favourite
+from .cards import card_cache
+from .models import Course, CourseDailyStats, Module, ModuleRevision, Subject, Comment, Rating, Favourite, Change
+
+RATE_FIELD = serializers.DecimalField(max_digits=3, decimal_places=2)
 
 
 class SubjectsListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subject
-        fields = ('id', 'title')
+        fields = ('id', 'title', 'course_count')
+
+
+def user_state(instance):
+    """Per-user fields, filled from ``CourseQuerySet.with_user_state`` annotations.
+
+    They are overlaid on the shared representation, which stays identical for
+    every user.
+    """
+    my_rating = getattr(instance, 'my_rating', None)
+    return {
+        'liked': getattr(instance, 'liked', False),
+        'favourited': getattr(instance, 'favourited', False),
+        'my_rating': RATE_FIELD.to_representation(my_rating) if my_rating is not None else None,
+    }
+
+
+class CourseCardListSerializer(serializers.ListSerializer):
+    """Serializes a page of courses from the course card cache in one batch."""
+
+    def to_representation(self, data):
+        courses = list(data.all() if hasattr(data, 'all') else data)
+        cards = card_cache.get_many(courses, self.child.shared_representation)
+        representation = []
+        for course, card in zip(courses, cards):
+            rep = dict(card)
+            rep.update(user_state(course))
+            representation.append(rep)
+        return representation
 
 
 class CoursesListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = ('id', 'subject', 'title', 'overview', 'avr_rating', )
+        fields = ('id', 'subject', 'title', 'overview', 'avr_rating',
+                  'comment_count', 'last_comment_at', 'last_comment_preview', )
+        list_serializer_class = CourseCardListSerializer
 
     def to_representation(self, instance):
+        rep = self.shared_representation(instance)
+        rep.update(user_state(instance))
+        return rep
+
+    def shared_representation(self, instance):
         rep = super().to_representation(instance)
-        rep['likes'] = instance.likes.count()
+        rep['likes'] = instance.like_count
         return rep
 
 
 class ModulesListSerializer(serializers.ModelSerializer):
+    """Module headers, the text is served by ``/modules/<id>/content/``."""
+
     class Meta:
         model = Module
-        fields = '__all__'
+        exclude = ('text', )
 
 
 class CourseDetailSerializer(serializers.ModelSerializer):
@@ -31,12 +72,20 @@ class CourseDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Course
-        fields = ('id', 'subject', 'title', 'overview', 'created', 'avr_rating', 'modules', )
+        fields = ('id', 'subject', 'title', 'overview', 'created', 'avr_rating', 'modules',
+                  'comment_count', 'last_comment_at', 'last_comment_preview', )
 
     def to_representation(self, instance):
+        rep = self.shared_representation(instance)
+        rep.update(user_state(instance))
+        return rep
+
+    def shared_representation(self, instance):
         rep = super().to_representation(instance)
-        rep['like'] = instance.likes.count()
-        rep['comments'] = CommentSerializer(instance.comments.all(), many=True).data
+        rep['like'] = instance.like_count
+        # Only the newest comments are embedded, the rest are paged from /courses/<pk>/comments/
+        latest = instance.comments.order_by('-created')[:settings.COURSE_DETAIL_COMMENTS]
+        rep['comments'] = CommentSerializer(latest, many=True).data
         return rep
 
 
@@ -44,6 +93,8 @@ class CreateCourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         exclude = ('user', )
+        read_only_fields = ('comment_count', 'last_comment_at', 'last_comment_preview', 'version', 'updated',
+                            'like_count', 'rating_count', 'rating_avg', )
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -60,6 +111,7 @@ class ModuleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Module
         fields = '__all__'
+        read_only_fields = ('revision', )
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -79,6 +131,23 @@ class CreateSubjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = '__all__'
+        read_only_fields = ('version', 'updated', 'course_count', )
+
+
+class ModuleContentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Module
+        fields = ('id', 'revision', 'title', 'description', 'text', )
+
+
+class ModuleRevisionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ModuleRevision
+        fields = ('number', 'user', 'created', )
+
+
+class ModuleRollbackSerializer(serializers.Serializer):
+    revision = serializers.IntegerField(min_value=1)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -117,17 +186,68 @@ class RatingSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class CourseSummarySerializer(serializers.ModelSerializer):
+    subject = SubjectsListSerializer(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ('id', 'slug', 'title', 'overview', 'subject', )
+
+
 class FavouriteCoursesSerializer(serializers.ModelSerializer):
+    course = CourseSummarySerializer(read_only=True)
+
     class Meta:
         model = Favourite
-        fields = ('course', 'id')
+        fields = ('id', 'course', 'created', )
+
+
+class ProgressHeartbeatSerializer(serializers.Serializer):
+    position = serializers.IntegerField(min_value=0, required=False)
+    completed = serializers.BooleanField(default=False)
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    seq = serializers.IntegerField(source='id')
+
+    class Meta:
+        model = Change
+        fields = ('seq', 'model', 'object_id', 'course_id', 'action', 'data', 'created')
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    after = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    wait = serializers.IntegerField(min_value=0, max_value=settings.CHANGE_FEED_MAX_WAIT, default=0)
+
+
+class CourseDailyStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CourseDailyStats
+        fields = ('day', 'likes_added', 'likes_removed', 'favourites_added', 'favourites_removed',
+                  'ratings_added', 'ratings_removed', 'rating_change', 'comments_added', 'comments_removed')
+
+
+class CourseTotalsSerializer(CourseDailyStatsSerializer):
+    class Meta(CourseDailyStatsSerializer.Meta):
+        fields = CourseDailyStatsSerializer.Meta.fields[1:]
+
+
+class CourseStatsQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=1, max_value=settings.COURSE_STATS_MAX_DAYS, default=30)
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), min_length=1,
+                                max_length=settings.BULK_EDIT_MAX_ITEMS)
+
 
-        def get_favourite(self, obj):
-            if obj.favourite:
-                return obj.favourite
-            return ''
+class BulkUpdateSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.DictField(), min_length=1,
+                                  max_length=settings.BULK_EDIT_MAX_ITEMS)
 
-        def to_representation(self, instance):
-            rep = super().to_representation(instance)
-            rep['favourite'] = self.get_favourite(instance)
-            return rep
+    def validate_items(self, items):
+        for item in items:
+            if not isinstance(item.get('id'), int):
+                raise serializers.ValidationError('Every item needs an integer "id"')
+        return items
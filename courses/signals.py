@@ -0,0 +1,158 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .cards import card_cache
+from . import recompute, rollups, slugs
+from .events import publish
+from .feed import record_change
+from .models import Change, Comment, Course, Favourite, Like, Module, Rating, Subject
+from .versions import bump_course, bump_subjects
+
+# Sent by the views, pushed to clients subscribed to the course events stream
+comment_posted = Signal()  # comment, action
+course_liked = Signal()  # course, user, liked
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Favourite)
+def feed_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_change(instance, Change.CREATED if created else Change.UPDATED)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Favourite)
+def feed_deleted(sender, instance, **kwargs):
+    record_change(instance, Change.DELETED)
+
+
+@receiver(comment_posted)
+def push_comment(sender, comment, action, **kwargs):
+    from .serializers import CommentSerializer
+    data = {'action': action, 'comment': CommentSerializer(comment).data}
+    transaction.on_commit(lambda: publish(comment.course_id, 'comment', data))
+
+
+@receiver(course_liked)
+def push_like(sender, course, user, liked, **kwargs):
+    # No count: the stored like_count lags until the next recompute, clients add or subtract one
+    data = {'liked': liked, 'user': user.pk}
+    transaction.on_commit(lambda: publish(course.pk, 'like', data))
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_state(sender, instance, raw=False, **kwargs):
+    # Lets post_save handlers see what a course looked like before the save
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Course.objects.filter(pk=instance.pk).values('subject_id', 'slug').first()
+
+
+@receiver(pre_save, sender=Rating)
+def remember_rate(sender, instance, raw=False, **kwargs):
+    instance._previous_rate = None
+    if instance.pk and not raw:
+        instance._previous_rate = Rating.objects.filter(pk=instance.pk).values_list('rate', flat=True).first()
+
+
+@receiver(pre_save, sender=Subject)
+def remember_subject_state(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Subject.objects.filter(pk=instance.pk).values('slug').first()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Subject)
+def slug_renamed(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if previous and previous['slug'] != instance.slug:
+        slugs.renamed(instance, previous['slug'])
+        transaction.on_commit(lambda: slugs.forget(sender, previous['slug']))
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Subject)
+def slug_deleted(sender, instance, **kwargs):
+    slugs.deleted(instance)
+    transaction.on_commit(lambda: slugs.forget(sender, instance.slug))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_version(sender, instance, **kwargs):
+    subject_pks = {instance.subject_id}
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        subject_pks.add(previous['subject_id'])
+    bump_course(instance.pk)
+    # Subject detail lists its courses; engagement writes are picked up by ``versions.subject_state``
+    bump_subjects(subject_pks)
+    transaction.on_commit(lambda: card_cache.invalidate([instance.pk]))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Favourite)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Favourite)
+def related_course_version(sender, instance, **kwargs):
+    bump_course(instance.course_id)
+    transaction.on_commit(lambda: card_cache.invalidate([instance.course_id]))
+
+
+@receiver(post_save, sender=Subject)
+def subject_version(sender, instance, created, **kwargs):
+    if not created:
+        bump_subjects([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Favourite)
+def engagement_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rollups.record_saved(instance, created, getattr(instance, '_previous_rate', None))
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Favourite)
+def engagement_deleted(sender, instance, **kwargs):
+    rollups.record_deleted(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Favourite)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Favourite)
+def course_dirty(sender, instance, **kwargs):
+    transaction.on_commit(lambda: recompute.mark_dirty('course', [instance.course_id]))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def subject_dirty(sender, instance, **kwargs):
+    subject_pks = [instance.subject_id]
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        subject_pks.append(previous['subject_id'])
+    transaction.on_commit(lambda: recompute.mark_dirty('subject', subject_pks))
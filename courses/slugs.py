@@ -0,0 +1,67 @@
+"""Slug lookups for courses and subjects.
+
+``resolve`` maps a slug to a primary key through Redis, so a slug request
+costs the same as one by pk. Entries are dropped when an object is renamed or
+deleted; the old slug is kept in ``SlugHistory`` and ``moved_to`` returns the
+slug it now redirects to.
+"""
+import redis
+from django.conf import settings
+
+from educa.redis_client import get_redis
+
+from .models import SlugHistory
+
+KEY_PREFIX = 'slug:'
+
+
+def _key(model, slug):
+    return f'{KEY_PREFIX}{model._meta.model_name}:{slug}'
+
+
+def resolve(model, slug):
+    """Primary key of the ``model`` instance with ``slug``, or ``None``."""
+    client = get_redis()
+    if client is not None:
+        try:
+            pk = client.get(_key(model, slug))
+        except redis.RedisError:
+            client = None
+        else:
+            if pk is not None:
+                return int(pk)
+    pk = model.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    if pk is not None and client is not None:
+        try:
+            client.set(_key(model, slug), pk, ex=settings.SLUG_CACHE_TTL)
+        except redis.RedisError:
+            pass
+    return pk
+
+
+def forget(model, slug):
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.delete(_key(model, slug))
+    except redis.RedisError:
+        pass
+
+
+def moved_to(model, slug):
+    """Current slug of the object that used to be called ``slug``, or ``None``."""
+    old = SlugHistory.objects.filter(model=model._meta.model_name, slug=slug).values('object_id').first()
+    if old is None:
+        return None
+    return model.objects.filter(pk=old['object_id']).values_list('slug', flat=True).first()
+
+
+def renamed(instance, old_slug):
+    name = instance._meta.model_name
+    SlugHistory.objects.filter(model=name, slug=instance.slug).delete()
+    SlugHistory.objects.update_or_create(model=name, slug=old_slug, defaults={'object_id': instance.pk})
+
+
+def deleted(instance):
+    SlugHistory.objects.filter(model=instance._meta.model_name, object_id=instance.pk).delete()
@@ -0,0 +1,58 @@
+"""Server-Sent Events endpoint for course updates, served directly by ASGI.
+
+``GET /courses/<pk>/events/`` keeps the connection open and streams
+``comment`` and ``like`` events, so clients no longer poll course detail.
+"""
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+
+from .events import subscribe
+from .models import Course
+
+EVENTS_PATH = re.compile(r'^/courses/(?P<pk>\d+)/events/$')
+
+
+async def _send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+
+
+async def _stream(send, course_pk):
+    await _send_body(send, 'retry: 3000\n\n')
+    async for message in subscribe(course_pk):
+        if message is None:
+            await _send_body(send, ': keepalive\n\n')
+            continue
+        event = json.loads(message)
+        await _send_body(send, f'event: {event["event"]}\ndata: {json.dumps(event["data"])}\n\n')
+
+
+async def course_events(scope, receive, send, course_pk):
+    exists = await sync_to_async(Course.objects.filter(pk=course_pk).exists)()
+    if not exists:
+        await send({'type': 'http.response.start', 'status': 404,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Not found'})
+        return
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    stream = asyncio.ensure_future(_stream(send, course_pk))
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+    finally:
+        stream.cancel()
+
+
+def events_route(path):
+    """Return the course pk when ``path`` is an events stream, else ``None``."""
+    match = EVENTS_PATH.match(path)
+    return int(match['pk']) if match else None
@@ -0,0 +1,34 @@
+from educa.celery import app
+
+
+@app.task(acks_late=True, ignore_result=True)
+def flush_progress_buffer():
+    from .progress import flush_progress
+    return flush_progress()
+
+
+@app.task(acks_late=True, ignore_result=True)
+def compact_change_feed():
+    from .feed import compact_changes
+    return compact_changes()
+
+
+@app.task(acks_late=True, ignore_result=True)
+def archive_engagement():
+    from .archive import archive_comments, purge_archived_comments
+    from .recompute import purge_runs
+    from .rollups import purge_events
+    return (archive_comments(pause=0.1), purge_archived_comments(pause=0.1), purge_events(pause=0.1),
+            purge_runs())
+
+
+@app.task(acks_late=True, ignore_result=True)
+def recompute_dirty():
+    from .recompute import run
+    run()
+
+
+@app.task(acks_late=True, ignore_result=True)
+def recompute_all():
+    from .recompute import run
+    run(full=True)
@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from courses.cards import card_cache
+from courses.models import Course, Subject
+
+User = get_user_model()
+
+
+def create_user(email, **extra_fields):
+    return User.objects.create_user(email, 'password', email.split('@')[0], is_active=True, **extra_fields)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def create_course(user, title='Algebra', subject=None):
+    subject = subject or Subject.objects.create(title='Math', slug='math')
+    return Course.objects.create(user=user, subject=subject, title=title, slug=title.lower(), overview='Overview')
+
+
+class CoursesTestCase(TestCase):
+    """Runs without Redis, on the in-process fallbacks, with an empty card cache.
+
+    Primary keys are reused between tests, so cards cached by one test would
+    otherwise be served to the next.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.multiple('educa.redis_client', _client=None, _failed_at=float('inf'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        card_cache.local.clear()
@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from courses.models import Course
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class CourseSaveTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        self.course = create_course(self.author)
+
+    def test_save_keeps_concurrent_counters_and_version(self):
+        course = Course.objects.get(pk=self.course.pk)
+        version = course.version
+        # Written by another request between loading and saving the course
+        Course.objects.filter(pk=course.pk).update(like_count=F('like_count') + 1, comment_count=3,
+                                                   rating_avg=Decimal('4.50'), version=F('version') + 1)
+        course.title = 'Geometry'
+        course.save()
+
+        course = Course.objects.get(pk=course.pk)
+        self.assertEqual((course.title, course.like_count, course.comment_count, course.rating_avg),
+                         ('Geometry', 1, 3, Decimal('4.50')))
+        self.assertEqual(course.version, version + 2)
+
+    def test_update_through_the_api(self):
+        Course.objects.filter(pk=self.course.pk).update(like_count=7)
+        response = client_for(self.author).patch(f'/courses/{self.course.pk}/', {'overview': 'New'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).like_count, 7)
+
+
+class CourseCardTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        author = create_user('author@example.com')
+        self.course = create_course(author)
+        Course.objects.filter(pk=self.course.pk).update(like_count=12, rating_count=2, rating_avg=Decimal('3.50'))
+
+    def test_cards_read_the_stored_counts(self):
+        anonymous = APIClient()
+        card = anonymous.get('/courses/').json()['results'][0]
+        self.assertEqual((card['likes'], card['avr_rating']), (12, 3.5))
+        detail = anonymous.get(f'/courses/{self.course.pk}/').json()
+        self.assertEqual((detail['like'], detail['avr_rating']), (12, 3.5))
+
+    def test_detail_doesnt_query_likes_or_ratings(self):
+        with CaptureQueriesContext(connection) as queries:
+            APIClient().get(f'/courses/{self.course.pk}/')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('COUNT(', sql.upper())
+        self.assertNotIn('FROM "courses_rating"', sql)
+
+    def test_unrated_course(self):
+        Course.objects.filter(pk=self.course.pk).update(rating_avg=None, version=F('version') + 1)
+        card = APIClient().get('/courses/').json()['results'][0]
+        self.assertEqual(card['avr_rating'], 'No one rated')
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from courses.feed import read_changes
+from courses.models import Change, Comment
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+@override_settings(CHANGE_FEED_SETTLE_DELAY=5)
+class ChangeFeedTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        self.course = create_course(self.author)
+        for n in range(4):
+            Comment.objects.create(course=self.course, user=self.author, text=f'Comment {n}')
+        self.sequences = list(Change.objects.order_by('id').values_list('id', flat=True))
+        self.staff = client_for(create_user('staff@example.com', is_staff=True))
+
+    def settle(self, *sequences):
+        Change.objects.filter(id__in=sequences or self.sequences) \
+            .update(created=timezone.now() - timedelta(seconds=10))
+
+    def test_fresh_changes_are_held_back(self):
+        self.assertEqual(read_changes(), [])
+        self.settle()
+        self.assertEqual([change.id for change in read_changes()], self.sequences)
+
+    def test_unsettled_change_holds_back_everything_after_it(self):
+        # The second entry may still be joined by a lower, uncommitted sequence
+        self.settle(self.sequences[0], *self.sequences[2:])
+        self.assertEqual([change.id for change in read_changes()], self.sequences[:1])
+
+    def test_paging_with_after(self):
+        self.settle()
+        response = self.staff.get('/changes/', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([change['seq'] for change in response.data['changes']], self.sequences[:3])
+        self.assertEqual((response.data['last_seq'], response.data['has_more']), (self.sequences[2], True))
+
+        response = self.staff.get('/changes/', {'after': response.data['last_seq'], 'limit': 3})
+        self.assertEqual([change['seq'] for change in response.data['changes']], self.sequences[3:])
+        self.assertEqual((response.data['last_seq'], response.data['has_more']), (self.sequences[-1], False))
+
+        response = self.staff.get('/changes/', {'after': response.data['last_seq']})
+        self.assertEqual((response.data['changes'], response.data['last_seq']), ([], self.sequences[-1]))
+        self.assertEqual(response.data['oldest_seq'], self.sequences[0])
+
+    def test_feed_is_staff_only(self):
+        self.assertEqual(client_for(self.author).get('/changes/').status_code, 403)
+        self.assertEqual(self.staff.get('/changes/', {'wait': 3600}).status_code, 400)
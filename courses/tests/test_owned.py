@@ -0,0 +1,50 @@
+from rest_framework.test import APIClient
+
+from courses.models import Comment, Module, Rating
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class OwnedObjectTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        self.other = create_user('other@example.com')
+        self.course = create_course(self.author)
+        self.comment = Comment.objects.create(course=self.course, user=self.author, text='Mine')
+        self.url = f'/comments/{self.comment.pk}/'
+
+    def test_someone_elses_object_is_forbidden(self):
+        client = client_for(self.other)
+        self.assertEqual(client.patch(self.url, {'text': 'Theirs'}, format='json').status_code, 403)
+        self.assertEqual(client.delete(self.url).status_code, 403)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.text, 'Mine')
+
+    def test_missing_object_is_not_found(self):
+        client = client_for(self.other)
+        self.assertEqual(client.patch('/comments/999/', {'text': 'x'}, format='json').status_code, 404)
+        self.assertEqual(client.delete('/comments/999/').status_code, 404)
+
+    def test_owner_and_staff(self):
+        client = client_for(self.author)
+        self.assertEqual(client.patch(self.url, {'text': 'Edited'}, format='json').status_code, 200)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.text, 'Edited')
+
+        staff = client_for(create_user('staff@example.com', is_staff=True))
+        self.assertEqual(staff.delete(self.url).status_code, 204)
+        self.assertFalse(Comment.objects.filter(pk=self.comment.pk).exists())
+
+    def test_anonymous_is_rejected_before_the_lookup(self):
+        self.assertEqual(APIClient().delete('/comments/999/').status_code, 401)
+
+    def test_malformed_pk_is_not_found(self):
+        client = client_for(self.author)
+        module = Module.objects.create(course=self.course, user=self.author, title='Module')
+        Rating.objects.create(course=self.course, user=self.author, rate=4)
+        self.assertEqual(client.patch('/comments/abc/', {'text': 'x'}, format='json').status_code, 404)
+        self.assertEqual(client.delete('/ratings/abc/').status_code, 404)
+        self.assertEqual(client.get('/modules/abc/history/').status_code, 404)
+        self.assertEqual(client.post('/modules/abc/rollback/', {'revision': 1}, format='json').status_code, 404)
+        self.assertEqual(client.get(f'/modules/{module.pk}/history/').status_code, 200)
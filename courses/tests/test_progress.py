@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from courses import progress
+from courses.models import Enrollment, Module, ModuleProgress
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class ProgressBufferTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('learner@example.com')
+        self.course = create_course(create_user('author@example.com'))
+        self.modules = [Module.objects.create(course=self.course, user=self.course.user, title=f'Module {n}')
+                        for n in range(2)]
+        self.buffer = progress.LocalProgressBuffer()
+        patcher = mock.patch('courses.progress._local_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, module, **state):
+        self.buffer.record(self.course.pk, self.user.pk, module.pk, **state)
+
+    def test_heartbeats_merge_until_flushed(self):
+        self.record(self.modules[0], position=10)
+        self.record(self.modules[0], completed=True)
+        self.record(self.modules[0], position=20)
+
+        self.assertFalse(ModuleProgress.objects.exists())
+        state = self.buffer.pending(self.course.pk, self.user.pk)[self.modules[0].pk]
+        self.assertEqual((state['completed'], state['position']), (True, 20))
+        self.assertEqual(progress.course_progress(self.course, self.user)['percent'], 50)
+
+        self.assertEqual(progress.flush_progress(self.buffer), 1)
+        row = ModuleProgress.objects.get()
+        self.assertEqual((row.module_id, row.completed, row.position), (self.modules[0].pk, True, 20))
+        self.assertTrue(Enrollment.objects.filter(course=self.course, user=self.user).exists())
+        self.assertEqual(self.buffer.size(), 0)
+        self.assertEqual(progress.course_progress(self.course, self.user)['percent'], 50)
+
+    def test_failed_flush_puts_entries_back(self):
+        self.record(self.modules[0], position=10, completed=True)
+        with mock.patch('courses.progress._persist', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                progress.flush_progress(self.buffer)
+        self.assertEqual(self.buffer.size(), 1)
+
+        self.assertEqual(progress.flush_progress(self.buffer), 1)
+        self.assertTrue(ModuleProgress.objects.get().completed)
+
+    def test_flush_takes_only_what_was_waiting(self):
+        for module in self.modules:
+            self.record(module, position=1)
+        persist = progress._persist
+
+        def persist_while_heartbeats_arrive(entries):
+            self.buffer.record(self.course.pk, f'other{self.buffer.size()}@example.com', self.modules[0].pk)
+            return persist(entries)
+
+        with mock.patch('courses.progress._persist', side_effect=persist_while_heartbeats_arrive) as persisted:
+            progress.flush_progress(self.buffer, batch_size=1)
+        self.assertEqual(persisted.call_count, 1)
+        self.assertEqual(self.buffer.size(), 1)
+
+    def test_deleted_modules_are_left_out(self):
+        for module in self.modules:
+            self.record(module, completed=True)
+        self.modules[1].delete()
+
+        state = progress.course_progress(self.course, self.user)
+        self.assertEqual((state['completed_modules'], state['total_modules'], state['percent']), (1, 1, 100))
+
+    @override_settings(PROGRESS_FLUSH_BATCH_SIZE=2)
+    def test_full_buffer_is_flushed_off_the_request(self):
+        with mock.patch('courses.progress.threading.Thread') as thread:
+            self.record(self.modules[0], position=1)
+            thread.assert_not_called()
+            self.buffer.record(self.course.pk, 'other@example.com', self.modules[0].pk, position=1)
+            self.buffer.record(self.course.pk, 'third@example.com', self.modules[0].pk, position=1)
+        thread.assert_called_once_with(target=self.buffer.flush_in_background, daemon=True)
+        thread.return_value.start.assert_called_once_with()
+        self.assertFalse(ModuleProgress.objects.exists())
+
+    def test_heartbeat_endpoint(self):
+        client = client_for(self.user)
+        response = client.post(f'/modules/{self.modules[0].pk}/progress/', {'position': 5, 'completed': True},
+                               format='json')
+        self.assertEqual(response.status_code, 202)
+        response = client.get(f'/courses/{self.course.pk}/progress/')
+        self.assertEqual((response.data['completed_modules'], response.data['percent']), (1, 50))
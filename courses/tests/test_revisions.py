@@ -0,0 +1,113 @@
+from django.test import SimpleTestCase
+
+from courses import revisions
+from courses.models import Module, ModuleRevision
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class DeltaTests(SimpleTestCase):
+    def test_round_trip(self):
+        cases = [
+            ('', ''),
+            ('one\ntwo\nthree\n', 'one\ntwo\nthree\n'),
+            ('one\ntwo\nthree\n', 'one\n2\nthree\nfour\n'),
+            ('one\ntwo', ''),
+            ('', 'one\ntwo'),
+            ('no newline at the end', 'no newline at the end\n'),
+            ('a\nb\nc\nd\ne\n', 'e\nd\nc\nb\na\n'),
+        ]
+        for new, old in cases:
+            with self.subTest(new=new, old=old):
+                self.assertEqual(revisions.apply_delta(new, revisions.make_delta(new, old)), old)
+
+    def test_unchanged_lines_are_copied(self):
+        new = ''.join(f'line {n}\n' for n in range(100))
+        old = new.replace('line 50\n', 'line fifty\n')
+        delta = revisions.make_delta(new, old)
+        self.assertEqual(delta, [[0, 50], 'line fifty\n', [51, 100]])
+
+    def test_encode_decode(self):
+        new = {'title': 'New', 'description': 'same', 'text': 'a\nb\nc\n'}
+        old = {'title': 'Old', 'description': 'same', 'text': 'a\nc\n'}
+        self.assertEqual(revisions.decode(new, revisions.encode(new, old)), old)
+
+
+class ModuleHistoryTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        course = create_course(self.author)
+        self.module = Module.objects.create(course=course, user=self.author, title='v1', text='first')
+        self.client = client_for(self.author)
+        self.url = f'/modules/{self.module.pk}/'
+
+    def edit(self, **content):
+        response = self.client.patch(self.url, content, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_history_rebuilds_every_revision(self):
+        self.edit(title='v2', text='first\nsecond')
+        self.edit(title='v3', text='second\nthird')
+        self.edit(description='described')
+
+        response = self.client.get(f'{self.url}history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['revision'], 4)
+        self.assertEqual([entry['number'] for entry in response.data['history']], [3, 2, 1])
+
+        expected = {1: ('v1', 'first'), 2: ('v2', 'first\nsecond'), 3: ('v3', 'second\nthird')}
+        for number, (title, text) in expected.items():
+            with self.subTest(revision=number):
+                response = self.client.get(f'{self.url}history/', {'revision': number})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual((response.data['title'], response.data['text'], response.data['description']),
+                                 (title, text, ''))
+        self.assertEqual(self.client.get(f'{self.url}history/', {'revision': 9}).status_code, 404)
+
+    def test_unchanged_content_adds_no_revision(self):
+        self.edit(video='https://example.com/video')
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.revision, 1)
+        self.assertFalse(ModuleRevision.objects.exists())
+
+    def test_rollback_is_a_new_revision(self):
+        self.edit(title='v2', text='changed')
+
+        response = self.client.post(f'{self.url}rollback/', {'revision': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['revision'], response.data['title'], response.data['text']),
+                         (3, 'v1', 'first'))
+        self.module.refresh_from_db()
+        self.assertEqual((self.module.revision, self.module.title), (3, 'v1'))
+        response = self.client.get(f'{self.url}history/', {'revision': 2})
+        self.assertEqual(response.data['title'], 'v2')
+
+        response = self.client.post(f'{self.url}rollback/', {'revision': 7}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_is_for_the_author_only(self):
+        other = client_for(create_user('other@example.com'))
+        self.assertEqual(other.get(f'{self.url}history/').status_code, 403)
+        self.assertEqual(other.post(f'{self.url}rollback/', {'revision': 1}, format='json').status_code, 403)
+
+
+class ModuleContentTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        author = create_user('author@example.com')
+        self.module = Module.objects.create(course=create_course(author), user=author, title='v1', text='first')
+        self.learner = client_for(create_user('learner@example.com'))
+
+    def test_content_is_revalidated_by_revision(self):
+        url = f'/modules/{self.module.pk}/content/'
+        response = self.learner.get(url)
+        self.assertEqual((response.status_code, response.data['text']), (200, 'first'))
+        self.assertEqual(self.learner.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_missing_or_malformed_pk_is_not_found(self):
+        for pk in (999, 'abc'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.learner.get(f'/modules/{pk}/content/').status_code, 404)
+                response = self.learner.post(f'/modules/{pk}/progress/', {'position': 5}, format='json')
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from courses import rollups
+from courses.models import CourseDailyStats, EngagementEvent, Rating
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class DailyRollupTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        self.course = create_course(self.author)
+        self.learner = client_for(create_user('learner@example.com'))
+        self.url = f'/courses/{self.course.pk}/'
+
+    def engage(self):
+        self.learner.post(f'{self.url}like/')
+        self.learner.post(f'{self.url}like/')
+        self.learner.post(f'{self.url}like/')
+        self.learner.post(f'{self.url}favourite/')
+        self.learner.post('/ratings/', {'course': self.course.pk, 'rate': 4}, format='json')
+        rating = Rating.objects.get(course=self.course)
+        self.learner.patch(f'/ratings/{rating.pk}/', {'rate': 5}, format='json')
+        self.learner.post('/comments/', {'course': self.course.pk, 'text': 'First'}, format='json')
+
+    def test_events_roll_up_per_day(self):
+        self.engage()
+        # Yesterday's share: the first like and unlike
+        yesterday = timezone.now() - timedelta(days=1)
+        first_events = EngagementEvent.objects.filter(kind=EngagementEvent.LIKE).order_by('id')[:2]
+        EngagementEvent.objects.filter(id__in=[event.id for event in first_events]).update(created=yesterday)
+
+        self.assertEqual(rollups.roll_up([self.course.pk]), 2)
+        self.assertEqual(rollups.roll_up([self.course.pk]), 0)
+
+        today = CourseDailyStats.objects.get(course=self.course, day=timezone.localdate())
+        self.assertEqual((today.likes_added, today.likes_removed, today.favourites_added, today.ratings_added,
+                          today.rating_change, today.comments_added), (1, 0, 1, 1, Decimal(5), 1))
+        before = CourseDailyStats.objects.get(course=self.course, day=timezone.localdate(yesterday))
+        self.assertEqual((before.likes_added, before.likes_removed), (1, 1))
+
+    def test_stats_endpoint_totals(self):
+        self.engage()
+        rollups.roll_up([self.course.pk])
+
+        response = client_for(self.author).get(f'{self.url}stats/', {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['days']), 7)
+        self.assertEqual(response.data['days'][-1]['day'], str(timezone.localdate()))
+        totals = response.data['totals']
+        self.assertEqual((totals['likes_added'], totals['likes_removed'], totals['favourites_added'],
+                          totals['ratings_added'], totals['comments_added']), (2, 1, 1, 1, 1))
+        self.assertEqual(Decimal(totals['rating_change']), Decimal(5))
+
+    def test_stats_are_for_the_author_only(self):
+        self.assertEqual(self.learner.get(f'{self.url}stats/').status_code, 403)
+        self.assertEqual(client_for(self.author).get(f'{self.url}stats/', {'days': 0}).status_code, 400)
+
+    def test_old_events_are_purged_and_rollups_kept(self):
+        self.engage()
+        rollups.roll_up([self.course.pk])
+        EngagementEvent.objects.update(created=timezone.now() - timedelta(days=400))
+
+        self.assertEqual(rollups.purge_events(older_than_days=90), 7)
+        self.assertFalse(EngagementEvent.objects.exists())
+        self.assertTrue(CourseDailyStats.objects.filter(course=self.course).exists())
@@ -0,0 +1,51 @@
+from rest_framework.test import APIClient
+
+from courses.models import Course, Subject
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class SlugRetrieveTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        self.course = create_course(self.author)
+        self.anonymous = APIClient()
+
+    def test_retrieve_by_slug(self):
+        response = self.anonymous.get('/courses/slug/algebra/')
+        self.assertEqual((response.status_code, response.data['id']), (200, self.course.pk))
+        response = self.anonymous.get('/subjects/slug/math/')
+        self.assertEqual((response.status_code, response.data['id']), (200, self.course.subject_id))
+        self.assertEqual(self.anonymous.get('/courses/slug/missing/').status_code, 404)
+
+    def test_rename_redirects_with_the_query_string(self):
+        response = client_for(self.author).patch(f'/courses/{self.course.pk}/', {'slug': 'linear-algebra'},
+                                                 format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.anonymous.get('/courses/slug/algebra/', {'fields': 'all', 'page': 2})
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], 'http://testserver/courses/slug/linear-algebra/?fields=all&page=2')
+        self.assertEqual(self.anonymous.get(response['Location']).data['id'], self.course.pk)
+
+    def test_renamed_twice_redirects_to_the_current_slug(self):
+        subject = Subject.objects.get(pk=self.course.subject_id)
+        for slug in ('maths', 'mathematics'):
+            subject.slug = slug
+            subject.save()
+        response = self.anonymous.get('/subjects/slug/math/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], 'http://testserver/subjects/slug/mathematics/')
+
+    def test_deleted_slug_is_not_found(self):
+        Course.objects.get(pk=self.course.pk).delete()
+        self.assertEqual(self.anonymous.get('/courses/slug/algebra/').status_code, 404)
+
+    def test_reused_slug_serves_the_new_object(self):
+        course = Course.objects.get(pk=self.course.pk)
+        course.slug = 'algebra-1'
+        course.save()
+        other = create_course(self.author, title='Algebra', subject=course.subject)
+        response = self.anonymous.get('/courses/slug/algebra/')
+        self.assertEqual((response.status_code, response.data['id']), (200, other.pk))
@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from courses.models import Module
+from educa import idempotency
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+@mock.patch('educa.idempotency.get_redis', mock.Mock(return_value=None))
+class IdempotentUploadTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        idempotency._local_store.entries.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = create_user('author@example.com')
+        self.course = create_course(self.author)
+        self.client = client_for(self.author)
+
+    def upload(self, content, key='upload-1'):
+        data = {'course': self.course.pk, 'title': 'Slides', 'file': SimpleUploadedFile('slides.txt', content)}
+        return self.client.post('/modules/', data, format='multipart', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_same_upload_is_replayed(self):
+        first = self.upload(b'first draft')
+        retry = self.upload(b'first draft')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (201, 'true'))
+        module = Module.objects.get()
+        self.assertEqual(module.file.read(), b'first draft')
+
+    def test_other_upload_of_the_same_size_is_rejected(self):
+        self.upload(b'first draft')
+        response = self.upload(b'final draft')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Module.objects.count(), 1)
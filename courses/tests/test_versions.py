@@ -0,0 +1,47 @@
+from rest_framework.test import APIClient
+
+from courses.models import Subject
+
+from .base import CoursesTestCase, client_for, create_course, create_user
+
+
+class ConditionalRetrieveTests(CoursesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author@example.com')
+        self.course = create_course(self.author)
+        self.learner = client_for(create_user('learner@example.com'))
+        self.anonymous = APIClient()
+
+    def test_matching_etag_is_not_modified(self):
+        for url in (f'/courses/{self.course.pk}/', f'/subjects/{self.course.subject_id}/'):
+            with self.subTest(url=url):
+                etag = self.anonymous.get(url)['ETag']
+                response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_etag_is_per_user(self):
+        url = f'/courses/{self.course.pk}/'
+        etag = self.learner.get(url)['ETag']
+        response = client_for(self.author).get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_like_changes_course_and_subject_etags(self):
+        course_url, subject_url = f'/courses/{self.course.pk}/', f'/subjects/{self.course.subject_id}/'
+        course_etag = self.anonymous.get(course_url)['ETag']
+        subject_etag = self.anonymous.get(subject_url)['ETag']
+        subject_version = Subject.objects.get(pk=self.course.subject_id).version
+
+        self.assertEqual(self.learner.post(f'{course_url}like/').status_code, 200)
+
+        self.assertEqual(self.anonymous.get(course_url, HTTP_IF_NONE_MATCH=course_etag).status_code, 200)
+        self.assertEqual(self.anonymous.get(subject_url, HTTP_IF_NONE_MATCH=subject_etag).status_code, 200)
+        # The subject ETag is derived from its courses, the subject row isn't written
+        self.assertEqual(Subject.objects.get(pk=self.course.subject_id).version, subject_version)
+
+    def test_missing_or_malformed_pk_is_not_found(self):
+        for url in ('/courses/999/', '/courses/abc/', '/subjects/999/', '/subjects/abc/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.anonymous.get(url).status_code, 404)
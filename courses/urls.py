@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import SimpleRouter
 
-from .views import CourseViewSet, ModuleViewSet, SubjectViewSet, CommentViewSet, RatingViewSet, FavouritesListView
+from .views import (CourseViewSet, ModuleViewSet, SubjectViewSet, CommentViewSet, RatingViewSet,
+                    FavouritesListView, ChangesView)
 
 router = SimpleRouter()
 router.register('courses', CourseViewSet, 'courses')
@@ -12,5 +13,6 @@ router.register('ratings', RatingViewSet, 'ratings')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('favourites_list/', FavouritesListView.as_view())
+    path('favourites_list/', FavouritesListView.as_view()),
+    path('changes/', ChangesView.as_view()),
 ]
@@ -0,0 +1,50 @@
+"""Per-resource versions used for ETag/Last-Modified on course and subject detail.
+
+A course version is bumped whenever anything shown on its detail page
+changes (the course, its modules, comments, ratings, likes or favourites).
+A subject version is only bumped when the subject itself changes or a course
+is added, moved or removed; subject detail also lists its courses, so its
+ETag is derived at read time from the subject version plus the sum of its
+course versions (``subject_state``). Engagement writes never touch the
+subject row, so they don't queue on its lock.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import F, Max, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Course, Subject
+
+
+def bump_subjects(subject_pks):
+    Subject.objects.filter(pk__in=subject_pks).update(version=F('version') + 1, updated=timezone.now())
+
+
+def bump_course(course_pk):
+    Course.objects.filter(pk=course_pk).update(version=F('version') + 1, updated=timezone.now())
+
+
+def bump_courses(course_pks):
+    """Bump many courses in one UPDATE."""
+    Course.objects.filter(pk__in=course_pks).update(version=F('version') + 1, updated=timezone.now())
+
+
+def subject_state(lookup):
+    """``pk``, ``version`` and ``updated`` of a subject and its courses, ``None`` if there is no such subject.
+
+    Course versions only grow, and removing a course bumps the subject, so
+    the pair of subject version and course version sum never repeats. A
+    malformed pk in ``lookup`` also gives ``None``.
+    """
+    try:
+        state = (Subject.objects.filter(**lookup)
+                 .annotate(course_versions=Coalesce(Sum('courses__version'), 0),
+                           courses_updated=Max('courses__updated'))
+                 .annotate(last_updated=Greatest('updated', Coalesce('courses_updated', 'updated')))
+                 .values('pk', 'version', 'course_versions', 'last_updated').first())
+    except (TypeError, ValueError, ValidationError):
+        return None
+    if state is None:
+        return None
+    return {'pk': state['pk'], 'version': f'{state["version"]}.{state["course_versions"]}',
+            'updated': state['last_updated']}
@@ -1,21 +1,49 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django_filters import rest_framework as rest_filter
 from rest_framework import views, filters, mixins, viewsets
 from rest_framework.decorators import action
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from .models import Course, Module, Subject, Like, Comment, Rating, Favourite
+from .models import Course, CourseDailyStats, Module, Subject, Like, Comment, Rating, Favourite, Enrollment
 from .serializers import (CoursesListSerializer, CourseDetailSerializer, CreateCourseSerializer,
                           SubjectsListSerializer, SubjectDetailSerializer, CreateSubjectSerializer,
-                          ModuleSerializer, CommentSerializer, RatingSerializer, FavouriteCoursesSerializer, )
-from .permissions import IsAdminUser, IsAuthor, IsAuthorOrIsAdmin
+                          ModuleSerializer, CommentSerializer, RatingSerializer, FavouriteCoursesSerializer,
+                          ProgressHeartbeatSerializer, ChangeSerializer, ChangesQuerySerializer,
+                          ModuleContentSerializer, ModuleRevisionSerializer, ModuleRollbackSerializer,
+                          CourseDailyStatsSerializer, CourseTotalsSerializer, CourseStatsQuerySerializer, )
+from . import counters, revisions, rollups
+from .feed import oldest_sequence, read_changes
+from .mixins import BulkOwnedMixin, ConditionalRetrieveMixin, OwnedObjectMixin, SlugRetrieveMixin
+from .pagination import CommentsPagination, FavouritesPagination
+from .permissions import IsAdminUser, IsAuthor, IsAuthorOrIsAdmin, IsStaff
+from .progress import course_progress, get_buffer
+from .signals import comment_posted, course_liked
+from .versions import subject_state
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(SlugRetrieveMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset
+        if self.action == 'retrieve':
+            courses = Course.objects.with_user_state(self.request.user)
+            queryset = queryset.prefetch_related(Prefetch('courses', queryset=courses))
+        return queryset
+
+    def version_state(self, lookup):
+        return subject_state(lookup)
+
     def get_serializer_class(self):
         if self.action == 'list':
             return SubjectsListSerializer
@@ -37,7 +65,7 @@ class CoursesFilter(rest_filter.FilterSet):
         fields = ('created', )
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(SlugRetrieveMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CreateCourseSerializer
     filter_backends = [
@@ -45,8 +73,20 @@ class CourseViewSet(viewsets.ModelViewSet):
         filters.SearchFilter,
         filters.OrderingFilter
     ]
-    search_fields = ['title', 'overview', 'subject']
-    ordering_fields = ['created', 'title']
+    search_fields = ['title', 'overview', 'subject__title']
+    # like_count/rating_avg are rebuilt by courses.recompute, so popularity sorts use a stored column
+    ordering_fields = ['created', 'title', 'like_count', 'rating_avg']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset
+        if self.action == 'list' or self.action == 'retrieve':
+            queryset = queryset.with_user_state(self.request.user)
+        if self.action == 'retrieve':
+            # Module bodies are fetched separately from /modules/<id>/content/
+            queryset = queryset.prefetch_related(Prefetch('modules', queryset=Module.objects.defer('text')))
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -59,69 +99,198 @@ class CourseViewSet(viewsets.ModelViewSet):
     def like(self, request, pk=None):
         course = self.get_object()
         user = request.user
-        try:
-            like = Like.objects.get(course=course, user=user)
-            like.is_liked = not like.is_liked
-            if like.is_liked:
-                like.save()
-            else:
-                like.delete()
-            message = 'like' if like.is_liked else 'dislike'
-        except Like.DoesNotExist:
-            Like.objects.create(course=course, user=user, is_liked=True)
+        deleted, _ = Like.objects.filter(course=course, user=user).delete()
+        if deleted:
+            message = 'dislike'
+            liked = False
+        else:
+            # get_or_create absorbs a concurrent duplicate request
+            Like.objects.get_or_create(course=course, user=user)
             message = 'liked'
+            liked = True
+        course_liked.send(sender=self.__class__, course=course, user=user, liked=liked)
         return Response(message, status=200)
 
+    @action(['GET'], detail=True, pagination_class=CommentsPagination)
+    def comments(self, request, pk=None):
+        """Live comments of the course, newest first, paged with a cursor."""
+        course = self.get_object()
+        page = self.paginate_queryset(course.comments.all())
+        return self.get_paginated_response(CommentSerializer(page, many=True).data)
+
     @action(['POST'], detail=True)
     def favourite(self, request, pk=None):
         course = self.get_object()
         user = request.user
-        try:
-            favourite = Favourite.objects.get(course=course, user=user)
-            favourite.is_favourite = not favourite.is_favourite
-            if favourite.is_favourite:
-                favourite.save()
-            else:
-                favourite.delete()
-            message = 'added to favourites' if favourite.is_favourite else 'deleted in favourites'
-        except Favourite.DoesNotExist:
-            Favourite.objects.create(course=course, user=user, is_favourite=True)
+        deleted, _ = Favourite.objects.filter(course=course, user=user).delete()
+        if deleted:
+            message = 'deleted in favourites'
+        else:
+            Favourite.objects.get_or_create(course=course, user=user)
             message = 'added to favourites'
         return Response(message, status=200)
 
+    @action(['POST'], detail=True)
+    def enroll(self, request, pk=None):
+        course = self.get_object()
+        _, created = Enrollment.objects.get_or_create(course=course, user=request.user)
+        message = 'enrolled' if created else 'already enrolled'
+        return Response(message, status=200)
+
+    @action(['GET'], detail=True)
+    def progress(self, request, pk=None):
+        course = self.get_object()
+        return Response(course_progress(course, request.user))
+
+    @action(['GET'], detail=True)
+    def stats(self, request, pk=None):
+        """Daily engagement of the last ``?days=<n>`` days (30 by default), read from the rollups."""
+        course = self.get_object()
+        query = CourseStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        series = rollups.daily_series(course.pk, query.validated_data['days'])
+        totals = CourseDailyStats(**{field: sum(getattr(stats, field) for stats in series) for field in rollups.FIELDS})
+        return Response({
+            'course': course.pk,
+            'days': CourseDailyStatsSerializer(series, many=True).data,
+            'totals': CourseTotalsSerializer(totals).data,
+        })
+
     def get_permissions(self):
-        if self.action == 'list' or self.action == 'retrieve':
+        if self.action in ('list', 'retrieve', 'comments'):
             return []
-        elif self.action == 'create' or self.action == 'like' or self.action == 'favourite':
+        elif self.action in ('create', 'like', 'favourite', 'enroll', 'progress'):
             return [IsAuthenticated()]
+        elif self.action == 'stats':
+            return [IsAuthor()]
         return [IsAuthorOrIsAdmin()]
 
 
-class ModuleViewSet(mixins.CreateModelMixin,
+class ModuleViewSet(BulkOwnedMixin,
+                    mixins.CreateModelMixin,
                     mixins.UpdateModelMixin,
                     mixins.DestroyModelMixin,
                     GenericViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
-    permission_classes = [IsAuthorOrIsAdmin]
+    # Deleting needs neither the module body nor its files
+    fetch_only = {'destroy': ('id', 'course_id', 'user_id'), 'bulk_delete': ('id', 'course_id', 'user_id'),
+                  'history': ('id', 'user_id', 'revision')}
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous = Module.objects.select_for_update().filter(pk=serializer.instance.pk) \
+            .values('revision', *revisions.CONTENT_FIELDS).get()
+        module = serializer.save()
+        revisions.record(module, previous, self.request.user)
+
+    @action(['GET'], detail=True)
+    def content(self, request, pk=None):
+        """Title, description and text of the module, revalidated with an ETag."""
+        state = get_object_or_404(Module.objects.values('revision'), pk=pk)
+        response = get_conditional_response(request, etag=quote_etag(f'module-{pk}-{state["revision"]}'))
+        if response is None:
+            module = get_object_or_404(Module.objects.only('id', 'revision', *revisions.CONTENT_FIELDS), pk=pk)
+            state['revision'] = module.revision
+            response = Response(ModuleContentSerializer(module).data)
+        response['ETag'] = quote_etag(f'module-{pk}-{state["revision"]}')
+        patch_cache_control(response, max_age=settings.CONDITIONAL_CACHE_MAX_AGE, must_revalidate=True, public=True)
+        return response
 
+    @action(['GET'], detail=True)
+    def history(self, request, pk=None):
+        """Earlier revisions, newest first; ``?revision=<n>`` returns that revision's content."""
+        module = self.get_object()
+        number = request.query_params.get('revision')
+        if number is None:
+            history = module.revisions.only('number', 'user_id', 'created')
+            return Response({'revision': module.revision,
+                             'history': ModuleRevisionSerializer(history, many=True).data})
+        module.refresh_from_db(fields=revisions.CONTENT_FIELDS)
+        content = revisions.content_at(module, int(number)) if number.isdigit() else None
+        if content is None:
+            raise Http404
+        return Response({'id': module.pk, 'revision': int(number), **content})
 
-class CommentViewSet(mixins.CreateModelMixin,
+    @action(['POST'], detail=True)
+    def rollback(self, request, pk=None):
+        """Make the content of an earlier revision current again, as a new revision."""
+        serializer = ModuleRollbackSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            previous = get_object_or_404(Module.objects.select_for_update()
+                                         .values('revision', *revisions.CONTENT_FIELDS), pk=pk)
+            module = self.get_object()
+            content = revisions.content_at(module, serializer.validated_data['revision'])
+            if content is None:
+                return Response({'revision': ['No such revision']}, status=400)
+            for field, value in content.items():
+                setattr(module, field, value)
+            module.save(update_fields=revisions.CONTENT_FIELDS)
+            revisions.record(module, previous, request.user)
+        return Response(ModuleContentSerializer(module).data)
+
+    @action(['POST'], detail=True)
+    def progress(self, request, pk=None):
+        # Heartbeats only need the course id, the module body is never loaded
+        module = get_object_or_404(Module.objects.only('id', 'course_id'), pk=pk)
+        serializer = ProgressHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        get_buffer().record(module.course_id, request.user.pk, module.pk, **serializer.validated_data)
+        return Response(status=202)
+
+    def get_permissions(self):
+        if self.action in ('progress', 'bulk_delete', 'bulk_update'):
+            return [IsAuthenticated()]
+        elif self.action == 'content':
+            return []
+        elif self.action in ('history', 'rollback'):
+            return [IsAuthor()]
+        return [IsAuthorOrIsAdmin()]
+
+
+class CommentViewSet(BulkOwnedMixin,
+                     mixins.CreateModelMixin,
                      mixins.UpdateModelMixin,
                      mixins.DestroyModelMixin,
                      GenericViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        comment = serializer.save()
+        counters.comment_created(comment)
+        comment_posted.send(sender=self.__class__, comment=comment, action='created')
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        comment = serializer.save()
+        counters.comment_updated(comment)
+        comment_posted.send(sender=self.__class__, comment=comment, action='updated')
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        comment_posted.send(sender=self.__class__, comment=instance, action='deleted')
+        instance.delete()
+        counters.comment_deleted(instance)
+
+    def perform_bulk_destroy(self, objects):
+        for comment in objects:
+            comment_posted.send(sender=self.__class__, comment=comment, action='deleted')
+        super().perform_bulk_destroy(objects)
+        counters.comments_deleted(objects)
+
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ('create', 'bulk_delete', 'bulk_update'):
             return [IsAuthenticated()]
         elif self.action == 'update':
             return [IsAuthor()]
         return [IsAuthorOrIsAdmin()]
 
 
-class RatingViewSet(mixins.CreateModelMixin,
+class RatingViewSet(OwnedObjectMixin,
+                    mixins.CreateModelMixin,
                     mixins.UpdateModelMixin,
                     mixins.DestroyModelMixin,
                     GenericViewSet):
@@ -135,10 +304,39 @@ class RatingViewSet(mixins.CreateModelMixin,
 
 
 class FavouritesListView(ListAPIView):
-    permission_classes = [IsAuthor]
+    """Favourite courses of the user, newest first.
+
+    ``?ids_only=true`` returns just the course ids (unpaginated) for clients
+    that cache favourite membership locally.
+    """
+    permission_classes = [IsAuthenticated]
     serializer_class = FavouriteCoursesSerializer
+    pagination_class = FavouritesPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Favourite.objects.filter(user=user)
+        return Favourite.objects.filter(user=user).select_related('course__subject')
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('ids_only') in ('1', 'true'):
+            ids = Favourite.objects.filter(user=request.user).order_by('-created').values_list('course_id', flat=True)
+            return Response(list(ids))
+        return super().list(request, *args, **kwargs)
+
+
+class ChangesView(views.APIView):
+    permission_classes = [IsStaff]
 
+    def get(self, request):
+        query = ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        after, limit = query.validated_data['after'], query.validated_data['limit']
+        changes = read_changes(after, limit + 1, query.validated_data['wait'])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return Response({
+            'changes': ChangeSerializer(changes, many=True).data,
+            'last_seq': changes[-1].id if changes else after,
+            'oldest_seq': oldest_sequence(),
+            'has_more': has_more,
+        })
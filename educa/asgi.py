@@ -2,6 +2,8 @@
 ASGI config for educa project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Course event streams (``/courses/<pk>/events/``) are answered here directly,
+every other request goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +15,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educa.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from courses.streams import course_events, events_route  # noqa: E402  (needs the app registry)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        course_pk = events_route(scope['path'])
+        if course_pk is not None:
+            return await course_events(scope, receive, send, course_pk)
+    return await django_application(scope, receive, send)
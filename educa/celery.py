@@ -1,9 +1,17 @@
 import os
 
 from celery import Celery
+from decouple import config
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educa.settings')
 
+# Celery's Django fixup runs the system checks on boot, and the URL checks
+# import the URLconf with every view, django_filters and the admin. Workers
+# skip them; `manage.py check` runs in the web deploy instead. PROCESS_ROLE is
+# read the way settings reads it, settings can't be imported this early.
+if config('PROCESS_ROLE', default='web') == 'worker':
+    os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
+
 app = Celery('educa')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
@@ -0,0 +1,148 @@
+"""Stored responses for requests sent with an ``Idempotency-Key`` header.
+
+The first response to a key is kept for ``IDEMPOTENCY_TTL`` seconds and
+replayed for retries, so a retried like doesn't toggle back and a retried
+registration doesn't hash the password and send the mail again. Keys are
+scoped to the caller's credentials, method and path. While the first request
+is still running, a lock makes duplicates wait for its response instead of
+running the view a second time.
+
+Entries live in Redis, or in process memory when Redis is not available.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+import redis
+from django.conf import settings
+
+from .redis_client import get_redis
+
+KEY_PREFIX = 'idempotency:'
+LOCK_PREFIX = 'idempotency-lock:'
+
+
+def request_key(request, key):
+    credentials = request.META.get('HTTP_AUTHORIZATION', '')
+    if not credentials and getattr(request, 'user', None) is not None and request.user.is_authenticated:
+        credentials = f'session:{request.user.pk}'
+    if not credentials:
+        credentials = f'anonymous:{request.META.get("REMOTE_ADDR", "")}'
+    scope = '\n'.join((credentials, request.method, request.path, key))
+    return hashlib.sha256(scope.encode()).hexdigest()
+
+
+def fingerprint(request):
+    if request.content_type == 'multipart/form-data':
+        return _multipart_fingerprint(request)
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def _multipart_fingerprint(request):
+    """Hash of the form fields and uploaded files of a multipart request.
+
+    The body may be too big to hold in memory, so it is parsed the usual way
+    (large uploads are spooled to temporary files) and each file is hashed in
+    chunks, then rewound for the view. DRF reuses the parsed ``POST`` and
+    ``FILES``.
+    """
+    digest = hashlib.sha256()
+    for name, values in sorted(request.POST.lists()):
+        for value in values:
+            digest.update(f'field\0{name}\0{value}\0'.encode())
+    for name, files in sorted(request.FILES.lists()):
+        for upload in files:
+            digest.update(f'file\0{name}\0{upload.name}\0{upload.size}\0{upload.content_type}\0'.encode())
+            for chunk in upload.chunks():
+                digest.update(chunk)
+            upload.seek(0)
+    return f'multipart:{digest.hexdigest()}'
+
+
+class RedisStore:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        entry = self.client.hgetall(f'{KEY_PREFIX}{key}')
+        if not entry:
+            return None
+        return {
+            'fingerprint': entry[b'fingerprint'].decode(),
+            'status': int(entry[b'status']),
+            'content_type': entry[b'content_type'].decode(),
+            'content': entry[b'content'],
+        }
+
+    def set(self, key, entry):
+        pipe = self.client.pipeline()
+        pipe.hset(f'{KEY_PREFIX}{key}', mapping=entry)
+        pipe.expire(f'{KEY_PREFIX}{key}', settings.IDEMPOTENCY_TTL)
+        pipe.execute()
+
+    def lock(self, key):
+        token = uuid.uuid4().hex
+        if self.client.set(f'{LOCK_PREFIX}{key}', token, nx=True, px=int(settings.IDEMPOTENCY_LOCK_TIMEOUT * 1000)):
+            return token
+        return None
+
+    def unlock(self, key, token):
+        if self.client.get(f'{LOCK_PREFIX}{key}') == token.encode():
+            self.client.delete(f'{LOCK_PREFIX}{key}')
+
+
+class LocalStore:
+    def __init__(self):
+        self.entries = {}
+        self.locks = {}
+        self.mutex = threading.Lock()
+
+    def get(self, key):
+        with self.mutex:
+            expires, entry = self.entries.get(key, (0, None))
+            if expires < time.monotonic():
+                self.entries.pop(key, None)
+                return None
+            return entry
+
+    def set(self, key, entry):
+        with self.mutex:
+            now = time.monotonic()
+            # Expired entries are dropped on write so the dict can't grow forever
+            for stale in [k for k, (expires, _) in self.entries.items() if expires < now]:
+                del self.entries[stale]
+            self.entries[key] = (now + settings.IDEMPOTENCY_TTL, entry)
+
+    def lock(self, key):
+        with self.mutex:
+            if self.locks.get(key, 0) > time.monotonic():
+                return None
+            self.locks[key] = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+            return key
+
+    def unlock(self, key, token):
+        with self.mutex:
+            self.locks.pop(key, None)
+
+
+_local_store = LocalStore()
+
+
+def get_store():
+    client = get_redis()
+    return RedisStore(client) if client is not None else _local_store
+
+
+def wait_for(store, key, timeout):
+    """Poll for the response of an in-flight request, ``None`` on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        try:
+            entry = store.get(key)
+        except redis.RedisError:
+            return None
+        if entry is not None:
+            return entry
+    return None
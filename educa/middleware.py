@@ -0,0 +1,130 @@
+import gzip
+import re
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import idempotency
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+ACCEPT_ENCODING = re.compile(r'\s*([\w*]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header that aren't refused with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        match = ACCEPT_ENCODING.match(part)
+        if match and float(match.group(2) or 1) > 0:
+            accepted.add(match.group(1).lower())
+    return accepted
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses larger than ``COMPRESSION_MIN_SIZE`` bytes.
+
+    Brotli is preferred when the client accepts it and the ``brotli`` package
+    is installed, gzip is used otherwise.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+            content = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+            content = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # The compressed body differs byte for byte, so a strong ETag must become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response of a POST retried with the same ``Idempotency-Key``.
+
+    See ``educa.idempotency``. Server errors aren't stored, so they can be
+    retried. Reusing a key with a different body is rejected with 422.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get('Idempotency-Key')
+        if request.method != 'POST' or not key:
+            return self.get_response(request)
+        if len(key) > 255:
+            return JsonResponse({'detail': 'Idempotency-Key must be at most 255 characters'}, status=400)
+
+        store = idempotency.get_store()
+        scoped_key = idempotency.request_key(request, key)
+        fingerprint = idempotency.fingerprint(request)
+        try:
+            entry = store.get(scoped_key)
+            token = None if entry is not None else store.lock(scoped_key)
+        except redis.RedisError:
+            return self.get_response(request)
+
+        if entry is None and token is None:
+            entry = idempotency.wait_for(store, scoped_key, settings.IDEMPOTENCY_WAIT)
+            if entry is None:
+                response = JsonResponse({'detail': 'A request with this Idempotency-Key is still in progress'},
+                                        status=409)
+                response['Retry-After'] = '1'
+                return response
+        if entry is not None:
+            return self.replay(entry, fingerprint)
+
+        try:
+            response = self.get_response(request)
+            if response.status_code < 500 and not response.streaming:
+                store.set(scoped_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'content_type': response.get('Content-Type', ''),
+                    'content': response.content,
+                })
+            return response
+        except redis.RedisError:
+            return response
+        finally:
+            try:
+                store.unlock(scoped_key, token)
+            except redis.RedisError:
+                pass
+
+    @staticmethod
+    def replay(entry, fingerprint):
+        if entry['fingerprint'] != fingerprint:
+            return JsonResponse({'detail': 'Idempotency-Key was already used with a different request'},
+                                status=422)
+        response = HttpResponse(entry['content'], status=entry['status'], content_type=entry['content_type'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
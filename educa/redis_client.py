@@ -0,0 +1,35 @@
+import time
+
+import redis
+from django.conf import settings
+
+RETRY_INTERVAL = 30
+
+_client = None
+_failed_at = None
+
+
+def get_redis():
+    """Return a shared Redis client, or ``None`` when Redis is unreachable.
+
+    Callers are expected to fall back to an in-process implementation when
+    ``None`` is returned. A failed connection is retried at most once every
+    ``RETRY_INTERVAL`` seconds so that a missing server doesn't add a connect
+    timeout to every request.
+    """
+    global _client, _failed_at
+    if _client is not None:
+        return _client
+    if _failed_at is not None and time.monotonic() - _failed_at < RETRY_INTERVAL:
+        return None
+    client = redis.Redis.from_url(settings.REDIS_URL,
+                                  socket_connect_timeout=0.5,
+                                  socket_timeout=1)
+    try:
+        client.ping()
+    except redis.RedisError:
+        _failed_at = time.monotonic()
+        return None
+    _client = client
+    _failed_at = None
+    return _client
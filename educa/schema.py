@@ -0,0 +1,69 @@
+"""OpenAPI schema and Swagger UI, built on first use instead of at import time.
+
+drf_yasg is only imported once the docs are requested. The schema is
+generated once, written to ``OPENAPI_SCHEMA_PATH`` and served from that file
+by every process afterwards; ``manage.py build_openapi_schema`` prebuilds it
+at deploy time.
+"""
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import permissions
+
+_lock = threading.Lock()
+_schema = None
+_docs_view = None
+
+
+def api_info():
+    from drf_yasg import openapi
+    return openapi.Info(
+        title="Blog",
+        default_version='v1',
+        description="Test description",
+        terms_of_service="https://www.ourapp.com/policies/terms/",
+        contact=openapi.Contact(email="asylbekegeshov@gmail.com"),
+        license=openapi.License(name="Test License"),
+    )
+
+
+def build_schema():
+    """Generate the schema and write it to ``OPENAPI_SCHEMA_PATH``."""
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    schema = OpenAPISchemaGenerator(api_info()).get_schema(request=None, public=True)
+    content = OpenAPICodecJson(validators=[]).encode(schema)
+    path = Path(settings.OPENAPI_SCHEMA_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+    return content
+
+
+def get_schema():
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                path = Path(settings.OPENAPI_SCHEMA_PATH)
+                _schema = path.read_bytes() if path.exists() else build_schema()
+    return _schema
+
+
+def schema_json(request):
+    return HttpResponse(get_schema(), content_type='application/json')
+
+
+def docs(request, *args, **kwargs):
+    # The UI page itself needs no schema, it loads SWAGGER_SETTINGS['SPEC_URL']
+    global _docs_view
+    if _docs_view is None:
+        from drf_yasg.views import get_schema_view
+        schema_view = get_schema_view(api_info(), public=True, permission_classes=(permissions.AllowAny,))
+        _docs_view = schema_view.with_ui()
+    return _docs_view(request, *args, **kwargs)
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 import os
 from pathlib import Path
 from decouple import config
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,11 +30,16 @@ DEBUG = config('DEBUG')
 
 ALLOWED_HOSTS = []
 
+# 'web' serves the API. 'worker' (Celery) boots without the admin, the API docs
+# and the filter backends, which only the URLconf needs.
+PROCESS_ROLE = config('PROCESS_ROLE', default='web')
+ENABLE_ADMIN = config('ENABLE_ADMIN', default=PROCESS_ROLE == 'web', cast=bool)
+ENABLE_DOCS = config('ENABLE_DOCS', default=PROCESS_ROLE == 'web', cast=bool)
+
 
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -42,22 +48,35 @@ INSTALLED_APPS = [
 
     'rest_framework',
     'rest_framework.authtoken',
-    'django_filters',
-    'drf_yasg',
     'celery',
 
     'courses',
     'account',
 ]
 
+# Only the views use django_filters (courses.views imports it at module
+# level), so worker code must never import the views or the URLconf: the app
+# isn't installed there. Task code lives in modules of its own (tasks,
+# progress, recompute, ...) that views import, not the other way around.
+if PROCESS_ROLE == 'web':
+    INSTALLED_APPS.append('django_filters')
+
+if ENABLE_ADMIN:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
+if ENABLE_DOCS:
+    INSTALLED_APPS.append('drf_yasg')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'educa.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'educa.middleware.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'educa.urls'
@@ -156,15 +175,179 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication'
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'educa.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'educa.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
 
+# Responses below this size aren't worth compressing. Brotli at quality 4 is
+# cheaper than gzip level 6 on large bodies, compare with manage.py bench_json
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
+SWAGGER_SETTINGS = {
+    'SPEC_URL': '/docs/openapi.json',
+}
+
+# Generated on first request (or by manage.py build_openapi_schema) and reused
+OPENAPI_SCHEMA_PATH = os.path.join(BASE_DIR, 'var', 'openapi.json')
+
 REDIS_HOST = '0.0.0.0'
 REDIS_PORT = '6379'
+REDIS_URL = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/1'
 CELERY_BROKER_URL = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
-CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'visibility_timeout': 3600,
+    # Redis emulates priorities with one list per step, 0 is served first
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
 CELERY_RESULT_BACKEND = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+
+# Time-critical mail never waits behind media or analytics batches
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = (
+    Queue('default'),
+    Queue('mail'),
+    Queue('media'),
+    Queue('analytics'),
+)
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_ROUTES = {
+    'account.tasks.rebuild_email_filter': {'queue': 'analytics', 'priority': 7},
+    'account.tasks.*': {'queue': 'mail', 'priority': 0},
+    # Frequent housekeeping that must keep up: the progress flush runs every
+    # PROGRESS_FLUSH_INTERVAL seconds and can't wait behind analytics batches
+    'courses.tasks.flush_progress_buffer': {'queue': 'default', 'priority': 5},
+    'courses.tasks.compact_change_feed': {'queue': 'default', 'priority': 5},
+    'courses.tasks.*': {'queue': 'analytics', 'priority': 7},
+}
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# One worker per queue, see celery_run.txt; long tasks get a prefetch of 1 so
+# a busy process doesn't sit on messages another one could run
+WORKER_PROFILES = {
+    'mail': {'concurrency': 4, 'prefetch_multiplier': 4},
+    'media': {'concurrency': 2, 'prefetch_multiplier': 1},
+    'analytics': {'concurrency': 2, 'prefetch_multiplier': 1},
+    'default': {'concurrency': 2, 'prefetch_multiplier': 1},
+}
+
+# Learner progress heartbeats are buffered and written to the database in batches
+PROGRESS_FLUSH_INTERVAL = 30
+PROGRESS_FLUSH_BATCH_SIZE = 1000
+
+# Change feed: long-poll interval, superseded entries are compacted after a day,
+# everything is expired after a week and the table never exceeds MAX_ROWS.
+# Entries are only served SETTLE_DELAY seconds after they were written, which
+# must be longer than any transaction that records a change takes to commit
+CHANGE_FEED_POLL_INTERVAL = 1
+CHANGE_FEED_SETTLE_DELAY = 5
+CHANGE_FEED_MAX_WAIT = 30
+CHANGE_FEED_COMPACT_AFTER = 24 * 60 * 60
+CHANGE_FEED_RETENTION = 7 * 24 * 60 * 60
+CHANGE_FEED_MAX_ROWS = 1000000
+
+# Course and subject detail are revalidated with ETag/Last-Modified on every use
+CONDITIONAL_CACHE_MAX_AGE = 0
+
+# Course detail embeds this many of the newest comments, /courses/<pk>/comments/ pages through all of them
+COURSE_DETAIL_COMMENTS = 10
+
+# Responses to POSTs with an Idempotency-Key are replayed for IDEMPOTENCY_TTL
+# seconds; a duplicate of a request still running waits up to
+# IDEMPOTENCY_WAIT seconds for its response, the running request's lock
+# expires after IDEMPOTENCY_LOCK_TIMEOUT seconds
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Server-Sent Events for course pages
+COURSE_EVENTS_KEEPALIVE = 15
+COURSE_EVENTS_QUEUE_SIZE = 100
+
+# Course card cache: per-process LRU entries, Redis TTL (seconds), how long
+# (seconds) a card may be locked for computing and waited on by others, and
+# how often hit counters are added to Redis
+COURSE_CARD_LRU_SIZE = 5000
+COURSE_CARD_TTL = 24 * 60 * 60
+COURSE_CARD_LOCK_TIMEOUT = 5
+COURSE_CARD_LOCK_WAIT = 0.5
+COURSE_CARD_STATS_INTERVAL = 10
+
+# Seconds a slug -> pk mapping stays in Redis; renames and deletes drop it earlier
+SLUG_CACHE_TTL = 60 * 60
+
+# Most objects a single bulk update/delete request may touch
+BULK_EDIT_MAX_ITEMS = 100
+
+# Admin changelists of unfiltered tables larger than this show the planner's
+# row estimate instead of an exact count; course pages list this many modules
+ADMIN_EXACT_COUNT_LIMIT = 100000
+ADMIN_INLINE_LIMIT = 20
+
+# Derived course/subject fields are rebuilt every RECOMPUTE_INTERVAL seconds,
+# RECOMPUTE_CHUNK_SIZE rows at a time; a crashed run's lock expires after
+# RECOMPUTE_LOCK_TIMEOUT seconds
+RECOMPUTE_INTERVAL = 60
+RECOMPUTE_CHUNK_SIZE = 500
+RECOMPUTE_LOCK_TIMEOUT = 60 * 60
+# Run logs older than this many days are purged with the engagement data
+RECOMPUTE_RUN_RETENTION_DAYS = 30
+
+# Comments move to the archive table after a year; archived ones are kept
+# forever unless a retention is set
+COMMENT_ARCHIVE_AFTER_DAYS = 365
+COMMENT_ARCHIVE_RETENTION_DAYS = None
+
+# Engagement events behind the daily course stats are kept this many days,
+# the daily rows forever; /courses/<pk>/stats/ covers at most MAX_DAYS
+ENGAGEMENT_EVENT_RETENTION_DAYS = 90
+COURSE_STATS_MAX_DAYS = 366
+
+# Bloom filter of registered emails checked before login and forgot-password
+# queries; sized for EMAIL_FILTER_CAPACITY users, at which about
+# EMAIL_FILTER_ERROR_RATE of unknown emails still reach the database
+EMAIL_FILTER_CAPACITY = 1000000
+EMAIL_FILTER_ERROR_RATE = 0.01
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-progress-buffer': {
+        'task': 'courses.tasks.flush_progress_buffer',
+        'schedule': PROGRESS_FLUSH_INTERVAL,
+    },
+    'compact-change-feed': {
+        'task': 'courses.tasks.compact_change_feed',
+        'schedule': 60 * 60,
+    },
+    'archive-engagement': {
+        'task': 'courses.tasks.archive_engagement',
+        'schedule': 24 * 60 * 60,
+    },
+    'recompute-dirty': {
+        'task': 'courses.tasks.recompute_dirty',
+        'schedule': RECOMPUTE_INTERVAL,
+    },
+    'recompute-all': {
+        'task': 'courses.tasks.recompute_all',
+        'schedule': 24 * 60 * 60,
+    },
+    'rebuild-email-filter': {
+        'task': 'account.tasks.rebuild_email_filter',
+        'schedule': 24 * 60 * 60,
+    },
+}
@@ -15,28 +15,23 @@ Including another URLconf
 """
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Blog",
-        default_version='v1',
-        description="Test description",
-        terms_of_service="https://www.ourapp.com/policies/terms/",
-        contact=openapi.Contact(email="asylbekegeshov@gmail.com"),
-        license=openapi.License(name="Test License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('account/', include('account.urls')),
     path('', include('courses.urls')),
-    path('docs/', schema_view.with_ui()),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+# Left out of worker processes, see PROCESS_ROLE in settings
+if settings.ENABLE_ADMIN:
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if settings.ENABLE_DOCS:
+    from . import schema
+    urlpatterns += [
+        path('docs/openapi.json', schema.schema_json),
+        path('docs/', schema.docs),
+    ]
+
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
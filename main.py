@@ -1,16 +1,257 @@
-# This is a sample Python script.
+"""Serve educa under gunicorn, or benchmark worker configurations.
 
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
+    python main.py serve [--worker-class sync|gthread|uvicorn] [--workers N] [--threads N]
+    python main.py bench [--worker-classes ...] [--workers N,N] [--duration S]
 
+``serve`` runs the WSGI app on sync or threaded workers, or the ASGI app
+on uvicorn workers. Only the ASGI app serves the course event streams
+(``/courses/<pk>/events/``); the WSGI app answers them with 404, which
+``serve`` warns about at startup. Worker and thread counts default to what the
+worker model needs per usable CPU, see ``default_counts``;
+``WEB_CONCURRENCY`` overrides the worker count.
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press Ctrl+F8 to toggle the breakpoint.
+A sync worker is busy for the whole of a ``/changes/?wait=`` long poll, so
+``--timeout`` is kept above ``CHANGE_FEED_MAX_WAIT`` or gunicorn would kill
+workers in the middle of a poll.
 
+The app is preloaded in the master: Django, the URLconf, views and
+serializers are imported once and the loaded objects are moved out of the
+garbage collector's reach with ``gc.freeze()``, so the forked workers share
+those pages instead of copying them on the first collection. Workers are
+recycled after ``--max-requests`` (with jitter, so they don't all restart at
+once), which is cheap as they are forked from the preloaded master.
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
+``kill -HUP <pid>`` replaces the workers gracefully; it doesn't re-import a
+preloaded app, so deploy new code with ``kill -USR2`` and then ``-QUIT`` the
+old master, or run with ``--no-preload``. ``--reload`` restarts workers on code
+changes, for development.
+
+``bench`` starts the server once per configuration, drives it with
+``manage.py run_scenario`` (run ``manage.py seed_data`` first) and prints
+requests/sec per core. The load generator runs on the same machine and takes
+its share of the CPU, so compare configurations with each other rather than
+with numbers from a separate client host.
+"""
+import argparse
+import gc
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educa.settings')
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+
+def cpu_count():
+    """CPUs this process may use, honouring affinity and a cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def default_counts(worker_class, cpus):
+    """``(workers, threads)`` for a worker model.
+
+    Sync workers block on the database, so there are twice as many as CPUs
+    (plus one) to keep the CPUs busy. Threaded workers wait on I/O in their
+    threads, one process per CPU is enough. Uvicorn workers run one event loop
+    each and multiplex requests on it.
+    """
+    if worker_class == 'sync':
+        return 2 * cpus + 1, 1
+    if worker_class == 'gthread':
+        return cpus + 1, 4
+    return cpus, 1
+
+
+def warm_up():
+    """Import everything a request touches, before the workers are forked."""
+    from django.db import connections
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    # No connection may be inherited by the workers
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    import educa.redis_client
+    # A client created in the master would share its sockets with every worker
+    educa.redis_client._client = None
+
+
+def run_gunicorn(app_uri, options):
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.util import import_app
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            application = import_app(app_uri)
+            if options['preload_app']:
+                warm_up()
+                gc.freeze()
+            return application
+
+    Server().run()
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+
+def min_timeout():
+    """The shortest worker timeout that outlasts the longest change feed long poll."""
+    from django.conf import settings
+
+    return settings.CHANGE_FEED_MAX_WAIT + 15
+
+
+def serve(args):
+    cpus = cpu_count()
+    workers, threads = default_counts(args.worker_class, cpus)
+    workers = args.workers or int(os.environ.get('WEB_CONCURRENCY', workers))
+    threads = args.threads or threads
+    preload = args.preload and not args.reload
+    asgi = args.worker_class == 'uvicorn'
+    timeout = args.timeout or min_timeout()
+    if timeout < min_timeout():
+        print(f'--timeout {timeout} is shorter than the change feed long poll, using {min_timeout()}',
+              file=sys.stderr)
+        timeout = min_timeout()
+    print(f'{args.worker_class}: {workers} workers x {threads} threads on {cpus} CPUs, '
+          f'preload {"on" if preload else "off"}', file=sys.stderr)
+    if not asgi:
+        print(f'{args.worker_class} workers serve WSGI only, /courses/<pk>/events/ will answer 404; '
+              f'use --worker-class uvicorn for the event streams', file=sys.stderr)
+    run_gunicorn('educa.asgi:application' if asgi else 'educa.wsgi:application', {
+        'bind': args.bind,
+        'worker_class': WORKER_CLASSES[args.worker_class],
+        'workers': workers,
+        'threads': threads,
+        'preload_app': preload,
+        'reload': args.reload,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'timeout': timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'pidfile': args.pidfile,
+        'post_fork': post_fork,
+        'accesslog': args.access_log,
+    })
+
+
+def wait_for_port(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with {process.returncode}')
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server did not listen on {host}:{port} within {timeout}s')
+
+
+def run_configuration(args, worker_class, workers, threads):
+    """Serve one configuration and return ``(requests/sec, p99 ms)`` of a run_scenario pass."""
+    host, port = '127.0.0.1', args.port
+    server = subprocess.Popen([sys.executable, __file__, 'serve', '--bind', f'{host}:{port}',
+                               '--worker-class', worker_class, '--workers', str(workers),
+                               '--threads', str(threads)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(host, port, server)
+        result = subprocess.run([sys.executable, 'manage.py', 'run_scenario', '--base-url', f'http://{host}:{port}',
+                                 '--concurrency', str(args.concurrency), '--duration', str(args.duration)],
+                                cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if result.returncode:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        throughput = float(re.search(r'([\d.]+) req/s', result.stdout).group(1))
+        p99 = float(re.search(r'^all\s+\d+\s+\d+\s+[\d.]+\s+[\d.]+\s+([\d.]+)', result.stdout, re.M).group(1))
+        return throughput, p99
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench(args):
+    cpus = cpu_count()
+    print(f'{cpus} CPUs, {args.concurrency} simulated users, {args.duration:.0f}s per configuration')
+    print(f'{"worker class":<12} {"workers":>7} {"threads":>7} {"req/s":>8} {"req/s/core":>10} {"p99 ms":>8}')
+    for worker_class in args.worker_classes.split(','):
+        default_workers, default_threads = default_counts(worker_class, cpus)
+        workers_sweep = ([int(n) for n in args.workers.split(',')] if args.workers
+                         else sorted({max(1, default_workers // 2), default_workers, default_workers * 2}))
+        threads_sweep = ([int(n) for n in args.threads.split(',')] if args.threads and worker_class == 'gthread'
+                         else [default_threads])
+        for workers in workers_sweep:
+            for threads in threads_sweep:
+                try:
+                    throughput, p99 = run_configuration(args, worker_class, workers, threads)
+                except RuntimeError as error:
+                    print(f'{worker_class:<12} {workers:>7} {threads:>7}  failed: {error}')
+                    continue
+                print(f'{worker_class:<12} {workers:>7} {threads:>7} {throughput:>8.1f} '
+                      f'{throughput / cpus:>10.1f} {p99:>8.1f}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='Run the app under gunicorn')
+    serve_parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:8000'))
+    serve_parser.add_argument('--worker-class', choices=WORKER_CLASSES, default='gthread')
+    serve_parser.add_argument('--workers', type=int, help='Default: derived from the CPU count or WEB_CONCURRENCY')
+    serve_parser.add_argument('--threads', type=int, help='Threads per gthread worker, default 4')
+    serve_parser.add_argument('--no-preload', dest='preload', action='store_false',
+                              help='Import the app in each worker, so HUP picks up new code')
+    serve_parser.add_argument('--reload', action='store_true', help='Restart workers on code changes (development)')
+    serve_parser.add_argument('--max-requests', type=int, default=1000,
+                              help='Recycle a worker after this many requests, 0 to never')
+    serve_parser.add_argument('--timeout', type=int,
+                              help='Seconds before a silent worker is killed, '
+                                   'default and minimum CHANGE_FEED_MAX_WAIT + 15')
+    serve_parser.add_argument('--graceful-timeout', type=int, default=30,
+                              help='Seconds workers get to finish requests on restart or shutdown')
+    serve_parser.add_argument('--keepalive', type=int, default=5)
+    serve_parser.add_argument('--pidfile', help='Where to write the master pid, for HUP/USR2/QUIT')
+    serve_parser.add_argument('--access-log', help="Access log file, '-' for stdout")
+    serve_parser.set_defaults(handler=serve)
+
+    bench_parser = commands.add_parser('bench', help='Sweep worker configurations with run_scenario')
+    bench_parser.add_argument('--worker-classes', default=','.join(WORKER_CLASSES))
+    bench_parser.add_argument('--workers',
+                              help='Comma-separated worker counts, default half, 1x and 2x the derived count')
+    bench_parser.add_argument('--threads', help='Comma-separated gthread thread counts, default 4')
+    bench_parser.add_argument('--concurrency', type=int, default=32, help='Simulated users')
+    bench_parser.add_argument('--duration', type=float, default=15, help='Seconds per configuration')
+    bench_parser.add_argument('--port', type=int, default=8765)
+    bench_parser.set_defaults(handler=bench)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()